@@ -0,0 +1,186 @@
+"""TWS side of the Webex and Teams bots.
+
+Reads the [TWS_API], [TWS_API:<name>] and [CACHE] sections of config.ini
+and runs the queries behind !loaded, !impact and !willrun through WAConn.
+"""
+import configparser
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from waconn.conn import WAConn
+from waconn.prop import hedgeOptions
+from waconn.fanout import fanoutCall
+from waconn.depgraph import PlanGraph, jobName
+from waconn.sharedcache import SharedCache
+from waconn.snapshot import PlanSnapshot
+
+# Load config
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+TIMEZONE_OFFSET = config['TWS_API'].getint('timezone_offset', fallback=0)
+FANOUT_TIMEOUT = config['TWS_API'].getfloat('fanout_timeout', fallback=30)
+GRAPH_TTL = config['TWS_API'].getint('graph_ttl', fallback=300)
+
+# Optional cache shared by all the bot worker processes
+CACHE_PATH = config.get('CACHE', 'path', fallback='')
+QUERY_TTL = config.getint('CACHE', 'query_ttl', fallback=30)
+RC_TTL = config.getint('CACHE', 'rc_ttl', fallback=3600)
+# Optional plan snapshot file: workers start with the plan already loaded
+SNAPSHOT_PATH = config.get('CACHE', 'snapshot', fallback='')
+
+
+def tws_conn(name, section):
+    """WAConn for a [TWS_API] section.
+
+    base_url is the URL up to /twsd, or a comma separated list (master,
+    backup...) tried in order; with hedge = true reads also go to the next
+    one when the first is slower than usual.
+    """
+    return WAConn(None, '', config={
+        'env': name,
+        'user': section['user'],
+        'pwd': section['password'],
+        'hosts': [u.strip().rstrip('/') for u in section['base_url'].split(',') if u.strip()],
+        'verify': section.getboolean('verify_ssl', fallback=True),
+        'hedge': hedgeOptions(config, section.name),
+    })
+
+
+# Extra TWS environments in [TWS_API:<name>] sections; !loaded queries all of them
+DEFAULT_ENV = config['TWS_API'].get('name', 'default')
+ENVIRONMENTS = {DEFAULT_ENV: tws_conn(DEFAULT_ENV, config['TWS_API'])}
+for section in config.sections():
+    if section.startswith('TWS_API:'):
+        ENVIRONMENTS[section[len('TWS_API:'):]] = tws_conn(section[len('TWS_API:'):], config[section])
+conn = ENVIRONMENTS[DEFAULT_ENV]
+
+# dependency graph of the current plan for !impact, rebuilt every GRAPH_TTL seconds
+plan_graph = PlanGraph()
+# held while the graph is rebuilt and while it is read, a worker serves requests in several threads
+plan_lock = threading.RLock()
+shared_cache = SharedCache(CACHE_PATH) if CACHE_PATH else None
+plan_snapshot = PlanSnapshot(SNAPSHOT_PATH, maxAge=GRAPH_TTL) if SNAPSHOT_PATH else None
+
+
+def cached(key, compute, ttl):
+    if shared_cache is None:
+        return compute()
+    return shared_cache.getOrCompute(key, compute, ttl)
+
+
+def query_job(job_name, env=None):
+    c = ENVIRONMENTS[env] if env else conn
+    return cached(f"job:{c.config['hosts'][0]}:{job_name}", partial(fetch_job, c, job_name), QUERY_TTL)
+
+
+def fetch_job(c, job_name):
+    payload = {
+        "filters": {
+            "jobInPlanFilter": {
+                "jobName": job_name
+            }
+        }
+    }
+    resp = c.post("/plan/current/job/query", json=payload)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def query_job_all(job_name):
+    """Query every environment concurrently, jobs are tagged with 'environment'."""
+    if len(ENVIRONMENTS) == 1:
+        return query_job(job_name), []
+    answer = fanoutCall({env: partial(query_job, job_name, env) for env in ENVIRONMENTS}, FANOUT_TIMEOUT)
+    for env, e in answer.errors.items():
+        logging.error("Job query on environment %s failed: %s", env, e)
+    return answer.results, list(answer.errors) + answer.timedOut
+
+
+def query_all_jobs():
+    """Yield every job in the current plan, one page at a time."""
+    return conn.query("/plan/current/job/query", {"filters": {"jobInPlanFilter": {"jobName": "*"}}})
+
+
+def get_plan_graph():
+    with plan_lock:
+        if plan_graph.built is None or time.time() - plan_graph.built > GRAPH_TTL:
+            if plan_snapshot is None:
+                plan_graph.build(query_all_jobs())
+            else:
+                # another worker may have refreshed the file already, it is only queried once older than GRAPH_TTL
+                try:
+                    plan_snapshot.refresh(conn.query)
+                    built = plan_snapshot.created
+                except Exception as e:
+                    if not plan_snapshot.load() or not len(plan_snapshot):
+                        raise
+                    logging.warning("Plan snapshot refresh failed, using the one from %.0fs ago: %s", plan_snapshot.age, e)
+                    # the master is tried again in GRAPH_TTL, not on every request
+                    built = time.time()
+                plan_graph.build(plan_snapshot.objects())
+                plan_graph.built = built
+            logging.info("Plan dependency graph rebuilt with %d jobs", len(plan_graph.jobs))
+        return plan_graph
+
+
+def format_impact(job_name, max_lines=50):
+    # the graph must not be rebuilt by another request while it is read
+    with plan_lock:
+        graph = get_plan_graph()
+        ids = graph.find(job_name)
+        if not ids:
+            return f"No jobs found for '{job_name}'."
+        parts = []
+        for job_id in ids:
+            released = sorted(jobName(graph.jobs[i]) for i in graph.successors(job_id) if i in graph.jobs)
+            total, path = graph.criticalPath(job_id)
+            text = f"{jobName(graph.jobs[job_id])} releases {len(released)} jobs"
+            if released:
+                text += ":\n" + "\n".join(released[:max_lines])
+                if len(released) > max_lines:
+                    text += f"\n... and {len(released) - max_lines} more"
+            text += f"\nCritical path (estimated {total}): " + " -> ".join(
+                graph.jobs[i]["name"] if i in graph.jobs else i for i in path)
+            parts.append(text)
+        return "\n\n".join(parts)
+
+
+def query_jobstreams(js_name):
+    resp = conn.get("/model/jobstream", params={'key': js_name})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def rc_evaluation(jobstream_id, from_date, to_date):
+    return cached(f"rc:{conn.config['hosts'][0]}:{jobstream_id}:{from_date}:{to_date}",
+                  lambda: fetch_rc_evaluation(jobstream_id, from_date, to_date), RC_TTL)
+
+
+def fetch_rc_evaluation(jobstream_id, from_date, to_date):
+    resp = conn.get(f"/model/jobstream/{jobstream_id}/rc-evaluation", params={'from': from_date, 'to': to_date})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def format_start_time(utc_str, offset_hours):
+    dt = datetime.strptime(utc_str, "%Y-%m-%dT%H:%M:%S.%fZ")
+    dt_local = dt + timedelta(hours=offset_hours)
+    return dt_local.strftime("%H:%M on %Y-%m-%d")
+
+
+def format_job_line(js):
+    try:
+        return (
+            ('[' + js["environment"] + '] ' if "environment" in js else '')
+            + js["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]
+            + '#' + '\u200b' + js["jobStreamInPlan"]["name"]
+            + '.' + js["name"]
+            + '   State: ' + js["status"]["internalStatus"]
+            + '   Start Time: ' + format_start_time(js["jobStreamInPlan"]["startTime"], TIMEZONE_OFFSET)
+        )
+    except Exception as ex:
+        logging.warning("Error parsing job entry: %s", ex)
+        return None
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import waconn
+import argparse
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import queue
+import threading
+
+QUERIES = {
+    'job': ('/plan/current/job/query', 'jobInPlanFilter', 'jobName',
+            ['id', 'jobDefinition.jobDefinitionInPlanKey.workstationInPlanKey.name',
+             'jobStreamInPlan.name', 'name', 'status.internalStatus', 'jobStreamInPlan.startTime']),
+    'jobstream': ('/plan/current/jobstream/query', 'jobStreamInPlanFilter', 'jobStreamName',
+                  ['id', 'key.workstationKey.name', 'key.name', 'key.startTime', 'status.internalStatus']),
+}
+
+OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+parser = argparse.ArgumentParser(description='Export jobs or job streams in plan to JSONL, CSV or Parquet.')
+parser.add_argument('what', help='object type to export', choices=sorted(QUERIES))
+parser.add_argument('-o','--output', help='output file', required=True, metavar="FILE")
+parser.add_argument('-f','--format', help='output format', choices=['jsonl','csv','parquet'], default='jsonl')
+parser.add_argument('-n','--name', help='name filter (default: all)', default='*', metavar="NAME_FILTER")
+parser.add_argument('-c','--columns', help='comma separated dotted paths to export (default: whole objects for jsonl, a summary for csv/parquet)', metavar="COLUMNS")
+parser.add_argument('-z','--compress', help='compress jsonl/csv output', choices=sorted(OPENERS))
+parser.add_argument('--page-size', help='objects per request (default: tuned from the server response times)', type=int, metavar="HOW_MANY")
+
+args = parser.parse_args()
+conn = waconn.WAConn('waconn.ini','/twsd')
+
+uri, filterName, field, defaultColumns = QUERIES[args.what]
+columns = args.columns.split(',') if args.columns else None
+if columns is None and args.format != 'jsonl':
+    columns = defaultColumns
+
+def pick(o, path):
+    for k in path.split('.'):
+        if not isinstance(o, dict) or k not in o:
+            return None
+        o = o[k]
+    return o
+
+def rows(page):
+    if columns is None:
+        return page
+    return [{c: pick(o, c) for c in columns} for o in page]
+
+# pages are fetched in a background thread while the previous one is written
+pages = queue.Queue(maxsize=4)
+failure = []
+
+def fetch():
+    try:
+        for page in conn.query(uri, {"filters": {filterName: {field: args.name}}}, howMany=args.page_size):
+            pages.put(rows(page))
+    except Exception as e:
+        failure.append(e)
+    finally:
+        pages.put(None)
+
+def openText():
+    if args.compress:
+        return OPENERS[args.compress](args.output, 'wt', encoding='utf-8', newline='')
+    return open(args.output, 'w', encoding='utf-8', newline='')
+
+def writeJsonl(f):
+    count = 0
+    for page in iter(pages.get, None):
+        f.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in page))
+        count += len(page)
+    return count
+
+def writeCsv(f):
+    w = csv.DictWriter(f, fieldnames=columns)
+    w.writeheader()
+    count = 0
+    for page in iter(pages.get, None):
+        w.writerows({c: v if not isinstance(v, (dict, list)) else json.dumps(v) for c, v in r.items()} for r in page)
+        count += len(page)
+    return count
+
+def writeParquet():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    count = 0
+    with pq.ParquetWriter(args.output, schema, compression=args.compress or 'snappy') as w:
+        for page in iter(pages.get, None):
+            data = {c: [None if r[c] is None else (r[c] if isinstance(r[c], str) else json.dumps(r[c])) for r in page] for c in columns}
+            w.write_table(pa.table(data, schema=schema))
+            count += len(page)
+    return count
+
+if args.format == 'parquet' and args.compress and args.compress != 'gzip':
+    parser.error('parquet output supports only gzip compression')
+
+fetcher = threading.Thread(target=fetch, daemon=True)
+fetcher.start()
+
+if args.format == 'parquet':
+    count = writeParquet()
+else:
+    with openText() as f:
+        count = writeJsonl(f) if args.format == 'jsonl' else writeCsv(f)
+
+fetcher.join()
+if failure:
+    print('Export interrupted: %s' % failure[0])
+    exit(2)
+print('Exported %d objects to %s' % (count, args.output))
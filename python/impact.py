@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import waconn
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description='Show the jobs a job in plan releases or depends on.')
+parser.add_argument('-j','--job', help='job as WORKSTATION#JOBSTREAM.JOB or just JOB', required=True, metavar="JOB")
+parser.add_argument('-u','--upstream', help='list predecessors instead of successors', action='store_true')
+parser.add_argument('-n','--jname', help='job name filter used to load the plan (default: all jobs)', default='*', metavar="J_FILTER")
+parser.add_argument('--offline', help='use the plan snapshot whatever its age, without calling the master', action='store_true')
+
+args = parser.parse_args()
+conn = waconn.WAConn('waconn.ini','/twsd')
+
+start = time.time()
+# the snapshot holds every job, it is used when the whole plan is loaded
+snapshot = waconn.snapshotFor(conn) if args.jname == '*' else None
+if args.offline and (snapshot is None or not len(snapshot)):
+    print('No plan snapshot, set snapshot_dir in waconn.ini and run once online')
+    exit(2)
+if snapshot is not None:
+    if not args.offline:
+        try:
+            snapshot.refresh(conn.query)
+        except Exception as e:
+            if not snapshot.load() or not len(snapshot):
+                raise
+            print('Plan snapshot refresh failed, using the old one: %s' % e)
+    graph = waconn.PlanGraph().build(snapshot.objects())
+    print('Loaded %d jobs from the plan snapshot (%.0fs old) in %.1fs' % (len(graph.jobs), snapshot.age, time.time() - start))
+else:
+    graph = waconn.PlanGraph().load(conn, {"filters": {"jobInPlanFilter": {"jobName": args.jname}}})
+    print('Loaded %d jobs in %.1fs' % (len(graph.jobs), time.time() - start))
+
+ids = graph.find(args.job)
+if not ids:
+    print('No job found')
+    exit(2)
+try:
+    graph.checkDependencies()
+except Exception as e:
+    print('Cannot tell the impact: %s' % e)
+    exit(2)
+
+for jobId in ids:
+    start = time.time()
+    job = graph.jobs[jobId]
+    if args.upstream:
+        related = graph.predecessors(jobId)
+        print('%s depends on %d jobs' % (waconn.depgraph.jobName(job), len(related)))
+    else:
+        related = graph.successors(jobId)
+        total, path = graph.criticalPath(jobId)
+        print('%s releases %d jobs' % (waconn.depgraph.jobName(job), len(related)))
+    for r in sorted(waconn.depgraph.jobName(graph.jobs[i]) if i in graph.jobs else i for i in related):
+        print('  ' + r)
+    if not args.upstream:
+        print('Critical path (estimated %s):' % total)
+        for i in path:
+            print('  ' + (waconn.depgraph.jobName(graph.jobs[i]) if i in graph.jobs else i))
+    print('(answered in %.1fms)' % ((time.time() - start) * 1000))
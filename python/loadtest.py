@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser(description='Replay synthetic webhooks against the Webex or Teams bot and measure command latency.')
+parser.add_argument('bot', help='bot to load', choices=['webex', 'teams'])
+parser.add_argument('-r','--rate', help='commands per second', type=float, default=5, metavar="RATE")
+parser.add_argument('-d','--duration', help='seconds to generate load', type=float, default=30, metavar="SECONDS")
+parser.add_argument('-j','--jobs', help='jobs returned by the stand-in TWS query', type=int, default=50, metavar="N")
+parser.add_argument('--tws-delay', help='stand-in TWS response time in milliseconds', type=float, default=50, metavar="MS")
+parser.add_argument('--timeout', help='seconds to wait for a reply before counting an error', type=float, default=30, metavar="SECONDS")
+parser.add_argument('--port', help='port of the stand-in servers', type=int, default=18080, metavar="PORT")
+parser.add_argument('--bot-port', help='port the bot is started on', type=int, default=18081, metavar="PORT")
+parser.add_argument('--bot-url', help='use an already running bot at this URL instead of starting one; it must be configured with the stand-in URLs', metavar="URL")
+
+args = parser.parse_args()
+here = os.path.dirname(os.path.abspath(__file__))
+standIn = 'http://127.0.0.1:%d' % args.port
+
+# command id -> time the webhook was sent / the reply reached the stand-in
+sent = {}
+replied = {}
+errors = {}
+lock = threading.Lock()
+# start of the bots' answer to !loaded when the query worked
+EXPECTED = 'Jobs loaded'
+
+
+def syntheticJobs(name):
+    return [{
+        "id": "%s_%d" % (name, i),
+        "name": "%s_%d" % (name, i),
+        "status": {"internalStatus": "SUCC" if i % 3 else "READY"},
+        "jobDefinition": {"jobDefinitionInPlanKey": {"workstationInPlanKey": {"name": "WKS%d" % (i % 5)}}},
+        "jobStreamInPlan": {"name": "JS%d" % (i % 7), "startTime": "2020-01-01T06:00:00.000Z",
+                            "workstationKey": {"name": "WKS%d" % (i % 5)}},
+    } for i in range(args.jobs)]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Webex API, Bot Framework connector and TWSd REST stand-ins."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *a):
+        pass
+
+    def reply(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        n = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(n) or b'{}')
+
+    def done(self, cmd, text):
+        # the first message answers the command: the job list, or an error the bot reports
+        with lock:
+            if cmd in sent and cmd not in replied and cmd not in errors:
+                if (text or '').startswith(EXPECTED):
+                    replied[cmd] = time.time()
+                else:
+                    errors[cmd] = 'bot replied: %s' % (text or '(no text)')[:200]
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/v1/people/me':
+            return self.reply({"id": "loadtest-bot"})
+        if path.startswith('/v1/attachment/actions/'):
+            cmd = path.rsplit('/', 1)[1]
+            return self.reply({"roomId": cmd, "inputs": {"action": "loaded", "jobname": "LOAD_" + cmd}})
+        if path.startswith('/v1/messages/'):
+            cmd = path.rsplit('/', 1)[1]
+            return self.reply({"roomId": cmd, "personId": "user", "text": "!loaded LOAD_" + cmd})
+        self.reply({}, 404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        body = self.body()
+        if path.endswith('/plan/current/job/query'):
+            time.sleep(args.tws_delay / 1000.0)
+            name = body["filters"]["jobInPlanFilter"]["jobName"]
+            return self.reply(syntheticJobs(name))
+        if path == '/v1/messages':
+            self.done(body.get("roomId"), body.get("text"))
+            return self.reply({"id": "m"})
+        if path.startswith('/v3/conversations/'):
+            self.done(urllib.parse.unquote(path.split('/')[3]), body.get("text"))
+            return self.reply({"id": "a"})
+        self.reply({}, 404)
+
+
+def writeConfig(workdir):
+    with open(os.path.join(workdir, 'config.ini'), 'w') as f:
+        f.write('[WEBEX]\naccess_token = loadtest\nallowed_room_id =\napi_base = %s/v1\nport = %d\n\n'
+                % (standIn, args.bot_port))
+        f.write('[TEAMS]\nallowed_channel_id =\nport = %d\n\n' % args.bot_port)
+        f.write('[TWS_API]\nbase_url = %s/twsd\nuser = u\npassword = p\nverify_ssl = false\n' % standIn)
+
+
+def startBot(workdir):
+    script = os.path.join(here, 'webex_loaded_bot.py' if args.bot == 'webex' else 'teams_bot.py')
+    env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get('PYTHONPATH', ''),
+               MICROSOFT_APP_ID='', MICROSOFT_APP_PASSWORD='', WACONN_LOG_LEVEL='WARNING')
+    proc = subprocess.Popen([sys.executable, script], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = 'http://127.0.0.1:%d' % args.bot_port
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=1)
+        except urllib.error.HTTPError:
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise Exception('bot did not start on ' + url)
+
+
+def webhook(botUrl, cmd):
+    if args.bot == 'webex':
+        url = botUrl + '/lab/pcs/maestro/events/webex'
+        body = {"resource": "attachmentActions", "event": "created", "data": {"id": cmd}}
+    else:
+        url = botUrl + '/api/messages'
+        body = {"type": "message", "id": cmd, "text": "!loaded LOAD_" + cmd, "channelId": "msteams",
+                "serviceUrl": standIn, "conversation": {"id": cmd}, "from": {"id": "user"},
+                "recipient": {"id": "loadtest-bot"}}
+    req = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    with lock:
+        sent[cmd] = time.time()
+    try:
+        urllib.request.urlopen(req, timeout=args.timeout).read()
+    except Exception as e:
+        with lock:
+            errors.setdefault(cmd, str(e))
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+server = ThreadingHTTPServer(('127.0.0.1', args.port), StandIn)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+proc = None
+workdir = tempfile.mkdtemp(prefix='loadtest')
+if args.bot_url:
+    botUrl = args.bot_url.rstrip('/')
+    print('Stand-in Webex API: %s/v1, TWS_API base_url: %s/twsd' % (standIn, standIn))
+else:
+    writeConfig(workdir)
+    proc, botUrl = startBot(workdir)
+
+try:
+    # open loop: commands are sent on schedule whether or not earlier ones finished
+    start = time.time()
+    count = int(args.rate * args.duration)
+    with ThreadPoolExecutor(max_workers=256) as pool:
+        for n in range(count):
+            delay = start + n / args.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(webhook, botUrl, 'cmd%06d' % n)
+        deadline = time.time() + args.timeout
+        while time.time() < deadline:
+            with lock:
+                if len(replied.keys() | errors.keys()) >= count:
+                    break
+            time.sleep(0.1)
+    elapsed = time.time() - start
+finally:
+    if proc is not None:
+        proc.terminate()
+        proc.wait()
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+with lock:
+    latencies = sorted(replied[c] - sent[c] for c in replied)
+    failed = len(set(sent) - set(replied))
+    # error replies and failed webhooks, the rest got no reply in time
+    reported = sorted(set(errors) - set(replied))
+
+print('bot:          %s' % args.bot)
+print('sent:         %d commands at %.1f/s over %.1fs' % (len(sent), args.rate, args.duration))
+print('completed:    %d' % len(latencies))
+print('errors:       %d (%.1f%%), %d error replies or failed webhooks, %d without reply'
+      % (failed, 100.0 * failed / max(len(sent), 1), len(reported), failed - len(reported)))
+print('throughput:   %.1f commands/s' % (len(latencies) / elapsed))
+print('latency p50:  %.0f ms' % (percentile(latencies, 50) * 1000))
+print('latency p90:  %.0f ms' % (percentile(latencies, 90) * 1000))
+print('latency p99:  %.0f ms' % (percentile(latencies, 99) * 1000))
+print('latency max:  %.0f ms' % ((latencies[-1] if latencies else float('nan')) * 1000))
+if reported:
+    print('first error:  %s' % errors[reported[0]])
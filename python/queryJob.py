@@ -4,18 +4,41 @@ import argparse
 
 parser = argparse.ArgumentParser(description='Query job.')
 parser.add_argument('-j','--jname', help='job name filter', required=True, metavar="J_FILTER")
+parser.add_argument('-e','--env', nargs='*', help='query these [WASERVER:<env>] environments concurrently (all of them if no name is given)', metavar="ENV")
+parser.add_argument('--timeout', help='seconds to wait for the environments when using --env', type=float, default=60)
+parser.add_argument('--offline', help='answer from the plan snapshot (see snapshot_dir in waconn.ini) without calling the master', action='store_true')
 
 args = parser.parse_args()
-conn = waconn.WAConn('waconn.ini','/twsd')
 
-# Query to find pools matching provided filter
-resp = conn.post('/plan/current/job/query',
-	{ "filters": { "jobInPlanFilter": { "jobName": args.jname } } }, 
-	headers={'How-Many': '500'})
+filters = { "filters": { "jobInPlanFilter": { "jobName": args.jname } } }
 
-r = resp.json()
+if args.offline:
+    conn = waconn.WAConn('waconn.ini','/twsd')
+    snapshot = waconn.snapshotFor(conn)
+    if snapshot is None or not len(snapshot):
+        print('No plan snapshot, set snapshot_dir in waconn.ini and run impact.py once')
+        exit(2)
+    print('Plan snapshot is %.0fs old' % snapshot.age)
+    r = snapshot.query({'name': args.jname})
+elif args.env is None:
+    conn = waconn.WAConn('waconn.ini','/twsd')
+
+    # Query to find pools matching provided filter
+    resp = conn.post('/plan/current/job/query', filters,
+        headers={'How-Many': '500'})
+
+    r = resp.json()
+else:
+    conns = waconn.connectAll('waconn.ini', '/twsd', args.env or None)
+    answer = waconn.fanoutQuery(conns, '/plan/current/job/query', filters,
+        headers={'How-Many': '500'}, timeout=args.timeout)
+    for env, e in answer.errors.items():
+        print('Environment %s failed: %s' % (env, e))
+    for env in answer.timedOut:
+        print('Environment %s did not answer in time' % env)
+    r = answer.results
 
 #print json.dumps(r, indent=2)
 for js in r:
-    print(js["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]+'#'+js["jobStreamInPlan"]["name"]+'.'+js["name"])
-
+    env = '[' + js['environment'] + '] ' if 'environment' in js else ''
+    print(env+js["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]+'#'+js["jobStreamInPlan"]["name"]+'.'+js["name"])
@@ -14,6 +14,7 @@ parser.add_argument('-w','--workstationName', help='TWS workstation name', requi
 parser.add_argument('-js','--jsName', help='job stream name', required=True, metavar="JS_NAME")
 parser.add_argument('-ia','--schedTime', help='job stream scheduled time / input arrival', metavar="JS_SCHED_TIME")
 parser.add_argument('-j','--jobName', help='job name', required=True, metavar="JOB_NAME")
+parser.add_argument('--impact', help='show the jobs released by the rerun before doing it', action='store_true')
 
 args = parser.parse_args()
 conn = waconn.WAConn('waconn.ini','/twsd')
@@ -34,6 +35,30 @@ if len(r) == 0:
     print('No job found')
     exit(2)
 
+if args.impact:
+    # the plan snapshot, when snapshot_dir is set, saves the full plan query
+    snapshot = waconn.snapshotFor(conn)
+    if snapshot is not None:
+        try:
+            snapshot.refresh(conn.query)
+        except Exception as e:
+            if not snapshot.load() or not len(snapshot):
+                raise
+            print('Plan snapshot refresh failed, using the old one: %s' % e)
+        graph = waconn.PlanGraph().build(snapshot.objects())
+    else:
+        graph = waconn.PlanGraph().load(conn)
+    try:
+        graph.checkDependencies()
+    except Exception as e:
+        print("Cannot tell the impact, not rerunning: %s" % e)
+        exit(2)
+    for j in r:
+        released = graph.successors(j["id"])
+        print("%s releases %d jobs:" % (waconn.depgraph.jobName(j), len(released)))
+        for name in sorted(waconn.depgraph.jobName(graph.jobs[i]) for i in released if i in graph.jobs):
+            print("  " + name)
+
 # and we call the rerun
 
 for j in r:
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# arguments making each script send a request right away
+SCRIPTS = {
+    'queryJob': ['-j', 'BENCH'],
+    'queryJS': ['-js', 'BENCH'],
+    'watchJob': ['-j', 'BENCH'],
+    'impact': ['-j', 'BENCH'],
+    'export': ['job', '-o', 'out.jsonl'],
+    'rerun': ['-w', 'WKS', '-js', 'JS', '-j', 'BENCH'],
+    'submit_job': ['-id', 'JSID', '-jn', 'BENCH', '-jw', 'WKS', '-ja', 'BENCH_1'],
+    'submit_jobstream': ['-j', 'JS', '-w', 'WKS'],
+    'switchmgr': ['-d', 'DOMAIN', '-m', 'WKS'],
+    'pool': ['-p', 'BENCH', '-a', 'WKS'],
+    'add_job': ['-j', 'BENCH', '-u', 'twsuser', '-w', 'WKS', '-t', 'ls'],
+}
+
+parser = argparse.ArgumentParser(description='Measure the time from process start to the first request sent to TWS for each script.')
+parser.add_argument('scripts', nargs='*', help='scripts to measure (default: all): ' + ', '.join(sorted(SCRIPTS)), metavar="SCRIPT")
+parser.add_argument('-n','--runs', help='runs per script', type=int, default=10, metavar="N")
+parser.add_argument('--timeout', help='seconds to wait for the first request', type=float, default=30, metavar="SECONDS")
+parser.add_argument('--port', help='port of the stand-in TWS server', type=int, default=18090, metavar="PORT")
+
+args = parser.parse_args()
+for name in args.scripts:
+    if name not in SCRIPTS:
+        parser.error('unknown script %s' % name)
+here = os.path.dirname(os.path.abspath(__file__))
+
+firstRequest = threading.Event()
+firstRequestAt = [0.0]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers every request with an empty list and notes when the first one came."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *a):
+        pass
+
+    def answer(self):
+        now = time.monotonic()
+        n = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(n)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'[]')
+        self.wfile.flush()
+        # set after answering, the script is killed as soon as it is
+        if not firstRequest.is_set():
+            firstRequestAt[0] = now
+            firstRequest.set()
+
+    do_GET = do_POST = do_PUT = answer
+
+
+def run(cmd, cwd, env):
+    """Seconds from start to the first request, None if none came in time."""
+    firstRequest.clear()
+    start = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not firstRequest.wait(args.timeout):
+            return None
+        return firstRequestAt[0] - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def baseline(env):
+    """Seconds to start and stop the interpreter alone."""
+    times = []
+    for _ in range(args.runs):
+        start = time.monotonic()
+        subprocess.run([sys.executable, '-c', 'pass'], env=env)
+        times.append(time.monotonic() - start)
+    return sorted(times)
+
+
+server = ThreadingHTTPServer(('127.0.0.1', args.port), StandIn)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+workdir = tempfile.mkdtemp(prefix='startup')
+with open(os.path.join(workdir, 'waconn.ini'), 'w') as f:
+    # an encoded password, so the scripts do not rewrite the file
+    f.write('[WASERVER]\nuser = bench\nkey = YmVuY2g=\nhosts = http://127.0.0.1:%d\nverify = false\n' % args.port)
+env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+try:
+    base = baseline(env)
+    print('%-18s %9s %9s %9s' % ('script', 'min ms', 'p50 ms', 'max ms'))
+    print('%-18s %9.0f %9.0f %9.0f' % ('(interpreter)', base[0] * 1000, base[len(base) // 2] * 1000, base[-1] * 1000))
+    for name in args.scripts or sorted(SCRIPTS):
+        cmd = [sys.executable, os.path.join(here, name + '.py')] + SCRIPTS[name]
+        times = [run(cmd, workdir, env) for _ in range(args.runs)]
+        ok = sorted(t for t in times if t is not None)
+        if not ok:
+            print('%-18s no request within %.0fs' % (name, args.timeout))
+            continue
+        missed = ' (%d runs sent no request)' % (len(times) - len(ok)) if len(ok) < len(times) else ''
+        print('%-18s %9.0f %9.0f %9.0f%s' % (name, ok[0] * 1000, ok[len(ok) // 2] * 1000, ok[-1] * 1000, missed))
+finally:
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -8,19 +8,127 @@
 
 import waconn
 import argparse
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 parser = argparse.ArgumentParser(description='Add a job in to the model')
-parser.add_argument('-jn','--jobName', help='job name', required=True, metavar="JOB_NAME")
-parser.add_argument('-jw','--jobWorkstationName', help='job workstation name', required=True, metavar="JOB_WORKSTATION_NAME")
+parser.add_argument('-jn','--jobName', help='job name', required=False, metavar="JOB_NAME")
+parser.add_argument('-jw','--jobWorkstationName', help='job workstation name', required=False, metavar="JOB_WORKSTATION_NAME")
 parser.add_argument('-jsw','--jsWorkstationName', help='job stream workstation name', required=False, metavar="JS_WORKSTATION_NAME")
 parser.add_argument('-id','--jsInternalIdentifier', help='job stream internal id', required=True, metavar="JS_ID")
-parser.add_argument('-ja','--jobAlias', help='job alias', required=True, metavar="JOB_ALIAS")
+parser.add_argument('-ja','--jobAlias', help='job alias', required=False, metavar="JOB_ALIAS")
+parser.add_argument('--wait', help='wait until the job completes, up to TIMEOUT seconds', type=float, nargs='?', const=0, metavar="TIMEOUT")
+parser.add_argument('-m','--manifest', help='bulk mode: CSV (jobName,jobWorkstationName,alias) or JSON lines file of jobs to submit in the job stream', required=False, metavar="MANIFEST")
+parser.add_argument('-p','--parallel', help='bulk mode: concurrent requests per pipeline step', type=int, default=8, metavar="N")
+parser.add_argument('-r','--retries', help='bulk mode: retries for refused requests', type=int, default=3, metavar="N")
 
 
 args = parser.parse_args()
+if args.manifest:
+    if not args.jsWorkstationName:
+        parser.error('--jsWorkstationName is required with --manifest')
+elif not (args.jobName and args.jobWorkstationName and args.jobAlias):
+    parser.error('either --manifest or --jobName, --jobWorkstationName and --jobAlias are required')
 conn = waconn.WAConn('waconn.ini','/twsd')
 
 
+def readManifest(path):
+    with open(path, newline='') as f:
+        if path.endswith('.json') or path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+# submit_job on the job stream only builds the job instance, so it can be retried on any error;
+# submit_ad_hoc_job adds the job to the plan and is retried only when the server refused it
+RETRY_ALWAYS = 'always'
+RETRY_REFUSED = 'refused'
+
+def postWithRetry(url, body, policy):
+    for attempt in range(args.retries + 1):
+        try:
+            resp = conn.post(url, json=body)
+        except Exception:
+            if policy != RETRY_ALWAYS or attempt == args.retries:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+        if resp.ok:
+            return resp.json()
+        refused = resp.status_code in (429, 503)
+        if attempt == args.retries or not (policy == RETRY_ALWAYS or refused):
+            raise Exception('HTTP %d from %s' % (resp.status_code, url))
+        time.sleep(2 ** attempt)
+
+def submitBulk(items):
+    # resolve every distinct job definition once, merging the header queries
+    planner = waconn.LookupPlanner(conn)
+    keys = sorted(set((i['jobName'], i['jobWorkstationName']) for i in items))
+    lookups = {k: planner.lookup('jobdefinition', k[0], workstationName=k[1]) for k in keys}
+    planner.flush()
+    jdIds = {}
+    for k, f in lookups.items():
+        if f.exception() is None and f.result():
+            jdIds[k] = f.result()[0]["id"]
+        elif f.exception() is not None:
+            print('Lookup of %s#%s failed: %s' % (k[1], k[0], f.exception()))
+    print("resolved %d of %d job definitions" % (len(jdIds), len(keys)))
+
+    jsUrl = '/plan/current/jobstream/' + args.jsWorkstationName + '%3B' + args.jsInternalIdentifier + '/action/submit_job'
+
+    def prepare(item):
+        jdId = jdIds.get((item['jobName'], item['jobWorkstationName']))
+        if jdId is None:
+            raise Exception('job definition not found')
+        return postWithRetry(jsUrl, {"jobDefinitionId": jdId, "alias": item['alias']}, RETRY_ALWAYS)
+
+    def submit(jobInplanInstance):
+        return postWithRetry('/plan/current/job/action/submit_ad_hoc_job', {"job": jobInplanInstance}, RETRY_REFUSED)
+
+    # the two steps run as a pipeline: a job is submitted as soon as its instance is ready
+    submitted = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.parallel) as prepPool, ThreadPoolExecutor(max_workers=args.parallel) as submitPool:
+        prepared = {prepPool.submit(prepare, i): i for i in items}
+        running = {}
+        for f in as_completed(prepared):
+            item = prepared[f]
+            try:
+                running[submitPool.submit(submit, f.result())] = item
+            except Exception as e:
+                failed += 1
+                print('Failed %s#%s as %s: %s' % (item['jobWorkstationName'], item['jobName'], item['alias'], e))
+        for f in as_completed(running):
+            item = running[f]
+            try:
+                r = f.result()
+                submitted.append(r)
+                print('Submitted %s#%s as %s: %s' % (item['jobWorkstationName'], item['jobName'], item['alias'], r["id"]))
+            except Exception as e:
+                failed += 1
+                print('Failed %s#%s as %s: %s' % (item['jobWorkstationName'], item['jobName'], item['alias'], e))
+    return submitted, failed
+
+if args.manifest:
+    items = readManifest(args.manifest)
+    start = time.time()
+    submitted, failed = submitBulk(items)
+    print('Submitted %d of %d jobs in %.1fs' % (len(submitted), len(items), time.time() - start))
+    if args.wait is not None and submitted:
+        waiter = waconn.JobWaiter(conn)
+        done = [waiter.add(r) for r in submitted]
+        waiter.run(timeout=args.wait or None)
+        for f in done:
+            if f.exception() is None:
+                job = f.result()
+                print('Job '+job["id"]+' completed with status '+job["status"]["internalStatus"])
+            else:
+                print(str(f.exception()))
+                failed += 1
+    exit(1 if failed else 0)
+
+
 # first rest call to get the jd id
 
 url = '/model/jobdefinition/header/query'
@@ -81,6 +189,13 @@ resp = conn.post(url, json=filters, headers=headers)
 r = resp.json()
 print('Submitted '+r["id"])
 
-
-
-
+if args.wait is not None:
+    waiter = waconn.JobWaiter(conn)
+    done = waiter.add(r)
+    waiter.run(timeout=args.wait or None)
+    try:
+        job = done.result()
+        print('Job '+r["id"]+' completed with status '+job["status"]["internalStatus"])
+    except TimeoutError as e:
+        print(str(e))
+        exit(2)
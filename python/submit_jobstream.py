@@ -11,21 +11,147 @@ VarBug = True # Change to True if running with master older than 9.4 FP3 or 9.3
 
 import waconn
 import argparse
+import csv
 import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 parser = argparse.ArgumentParser(description='Submit a job stream to the plan')
-parser.add_argument('-j','--jsName', help='job stream', required=True, metavar="JOB_STREAM")
-parser.add_argument('-w','--workstationName', help='job stream workstation name', required=True, metavar="WORKSTATION_NAME")
+parser.add_argument('-j','--jsName', help='job stream', required=False, metavar="JOB_STREAM")
+parser.add_argument('-w','--workstationName', help='job stream workstation name', required=False, metavar="WORKSTATION_NAME")
 parser.add_argument('-a','--alias', help='job stream alias', required=False, metavar="JS_ALIAS")
 parser.add_argument('-v','--variables', nargs='+', help='variables in key:value format', required=False, metavar="KEY:VALUE")
+parser.add_argument('-m','--manifest', help='bulk mode: CSV (jsName,workstationName,alias,variables) or JSON lines file of job streams to submit', required=False, metavar="MANIFEST")
+parser.add_argument('-p','--parallel', help='bulk mode: number of concurrent submissions', type=int, default=8, metavar="N")
+parser.add_argument('-o','--results', help='bulk mode: write one JSON line per submission to this file', required=False, metavar="RESULTS")
 
 args = parser.parse_args()
+if not args.manifest and not (args.jsName and args.workstationName):
+	parser.error('either --manifest or both --jsName and --workstationName are required')
 conn = waconn.WAConn('waconn.ini','/twsd')
 
-# first rest call to get the js id
-
 now = datetime.datetime.utcnow().isoformat()
 
+#define a function to convert a key:value pair in the json structure
+def varToTableVar(v):
+	a=v.split(":")
+	return {"key":a[0],"value":a[1]}
+
+def readManifest(path):
+	# CSV variables are space separated key:value pairs, JSON ones a list of them or an object
+	items = []
+	with open(path, newline='') as f:
+		if path.endswith('.json') or path.endswith('.jsonl'):
+			items = [json.loads(line) for line in f if line.strip()]
+		else:
+			for row in csv.DictReader(f):
+				row['variables'] = (row.get('variables') or '').split()
+				items.append(row)
+	for i in items:
+		v = i.get('variables') or []
+		if isinstance(v, dict):
+			i['variables'] = [{"key":k,"value":str(x)} for k, x in v.items()]
+		else:
+			i['variables'] = list(map(varToTableVar, v))
+	return items
+
+def checked(resp):
+	# error responses carry a messages object, not the expected result
+	if not resp.ok:
+		raise Exception('HTTP %d from %s' % (resp.status_code, resp.url))
+	return resp.json()
+
+def submitBulk(items):
+	# resolve every distinct job stream once, merging the header queries
+	planner = waconn.LookupPlanner(conn)
+	keys = sorted(set((i['jsName'], i['workstationName']) for i in items))
+	lookups = {k: planner.lookup('jobstream', k[0], workstationName=k[1], validIn=now) for k in keys}
+	planner.flush()
+	jsIds = {}
+	for k, f in lookups.items():
+		if f.exception() is None and f.result():
+			jsIds[k] = f.result()[0]["id"]
+		elif f.exception() is not None:
+			print('Lookup of %s#%s failed: %s' % (k[1], k[0], f.exception()))
+	print("resolved %d of %d job streams" % (len(jsIds), len(keys)))
+
+	# variable table of every job stream that gets variables, default table looked up at most once;
+	# a failed lookup only fails the items with variables of that job stream
+	vtIds = {}
+	vtErrors = {}
+	if VarBug:
+		needVt = sorted(set(jsIds[(i['jsName'], i['workstationName'])] for i in items
+			if i['variables'] and (i['jsName'], i['workstationName']) in jsIds))
+		with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+			defs = {jsId: pool.submit(lambda jsId: checked(conn.get('/model/jobstream/'+jsId)), jsId) for jsId in needVt}
+		default = []
+		for jsId, f in defs.items():
+			try:
+				js = f.result()
+				if "variableTableId" in js:
+					vtIds[jsId] = js["variableTableId"]
+					continue
+				if not default:
+					try:
+						r = checked(conn.post('/model/variabletable/header/query',
+							json={"filters": {"variableTableFilter": {"isDefaultTable": True}}},
+							headers={'How-Many': '1'}))
+						default.append(r[0]["id"] if r else Exception('default variable table not found'))
+					except Exception as e:
+						default.append(e)
+				if isinstance(default[0], Exception):
+					raise default[0]
+				vtIds[jsId] = default[0]
+			except Exception as e:
+				vtErrors[jsId] = e
+				print('Variable table of job stream %s not found: %s' % (jsId, e))
+
+	def submitOne(item):
+		jsId = jsIds.get((item['jsName'], item['workstationName']))
+		if jsId is None:
+			raise Exception('job stream not found')
+		submit = {"inputArrivalTime": now}
+		if item['variables']:
+			if jsId in vtErrors:
+				raise Exception('variable table not found: %s' % vtErrors[jsId])
+			submit["variableTable"] = item['variables']
+			if jsId in vtIds:
+				submit["variableTableId"] = vtIds[jsId]
+		if item.get('alias'):
+			submit["alias"] = item['alias']
+		return checked(conn.post('/plan/current/jobstream/' + jsId + '/action/submit_jobstream', json=submit))
+
+	failed = 0
+	out = open(args.results, 'w') if args.results else None
+	with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+		futures = {pool.submit(submitOne, i): n for n, i in enumerate(items)}
+		for f in as_completed(futures):
+			item = items[futures[f]]
+			name = item['workstationName'] + '#' + item['jsName'] + ('(' + item['alias'] + ')' if item.get('alias') else '')
+			result = {"line": futures[f] + 1, "jsName": item['jsName'], "workstationName": item['workstationName'], "alias": item.get('alias')}
+			try:
+				result["submitted"] = f.result()
+				print('Submitted %s: %s' % (name, ', '.join(result["submitted"])))
+			except Exception as e:
+				failed += 1
+				result["error"] = str(e)
+				print('Failed %s: %s' % (name, e))
+			if out:
+				out.write(json.dumps(result) + '\n')
+	if out:
+		out.close()
+	return failed
+
+if args.manifest:
+	items = readManifest(args.manifest)
+	start = time.time()
+	failed = submitBulk(items)
+	print('Submitted %d of %d job streams in %.1fs' % (len(items) - failed, len(items), time.time() - start))
+	exit(1 if failed else 0)
+
+# first rest call to get the js id
+
 resp = conn.post('/model/jobstream/header/query', 
 	json={"filters": {"jobstreamFilter": {"jobStreamName": args.jsName,"workstationName":args.workstationName,"validIn": now}}},
 	headers={'How-Many': '1'})
@@ -41,11 +167,6 @@ print("the js id is: " + jsId)
 
 submit = {"inputArrivalTime": now}
 
-#define a function to convert a key:value pair in the json structure
-def varToTableVar(v):
-	a=v.split(":")
-	return {"key":a[0],"value":a[1]}
-
 if args.variables:
 	# This list/map/lambda function, will apply the above varToTableVar function to each key:value pair specified with the "--variables" argument
 	submit["variableTable"]=list(map(lambda v: varToTableVar(v), args.variables))
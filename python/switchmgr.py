@@ -8,15 +8,106 @@
 
 import waconn
 import argparse
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 parser = argparse.ArgumentParser(description='Perform a switch of a domain manager ')
-parser.add_argument('-d','--domain', help='domain name', required=True, metavar="DOMAIN_NAME")
-parser.add_argument('-m','--manager', help='new manager workstation name', required=True, metavar="WORKSTATION_NAME")
+parser.add_argument('-d','--domain', help='domain name', required=False, metavar="DOMAIN_NAME")
+parser.add_argument('-m','--manager', help='new manager workstation name', required=False, metavar="WORKSTATION_NAME")
+parser.add_argument('-s','--switch', action='append', help='parallel mode: domain to switch, can be repeated', metavar="DOMAIN_NAME:WORKSTATION_NAME")
+parser.add_argument('-f','--manifest', help='parallel mode: CSV file with domain,manager columns', metavar="MANIFEST")
+parser.add_argument('-p','--parallel', help='parallel mode: concurrent switch requests', type=int, default=16, metavar="N")
+parser.add_argument('-t','--timeout', help='parallel mode: seconds to wait for the new managers', type=float, default=600, metavar="SECONDS")
+parser.add_argument('-i','--interval', help='parallel mode: seconds between domain status checks', type=float, default=5, metavar="SECONDS")
 
 args = parser.parse_args()
+if not (args.switch or args.manifest) and not (args.domain and args.manager):
+    parser.error('either --domain and --manager, or --switch/--manifest are required')
 conn = waconn.WAConn('waconn.ini','/twsd')
 
 
+# field of a DomainInPlan holding the name of its current manager workstation
+MANAGER_FIELD = 'managerName'
+
+def managerOf(dom):
+    if MANAGER_FIELD not in dom:
+        raise Exception('domain %s in plan has no %s field, it has: %s'
+                        % (dom.get('name'), MANAGER_FIELD, ', '.join(sorted(dom))))
+    return dom[MANAGER_FIELD] or ''
+
+def switchAll(switches):
+    start = time.time()
+    timing = {d: {} for d in switches}
+
+    # resolve every domain and manager with merged queries
+    planner = waconn.LookupPlanner(conn)
+    doms = {d: planner.lookup('domain', d) for d in switches}
+    wkss = {m: planner.lookup('workstationInPlan', m) for m in set(switches.values())}
+    planner.flush()
+    ids = {}
+    for d, m in switches.items():
+        if doms[d].exception() is None and doms[d].result() and wkss[m].exception() is None and wkss[m].result():
+            ids[d] = (doms[d].result()[0]["id"], wkss[m].result()[0]["id"])
+        else:
+            timing[d]['error'] = 'domain or workstation not found'
+    resolved = time.time()
+    print('resolved %d of %d domains in %.1fs' % (len(ids), len(switches), resolved - start))
+    # without the manager field no switch could be confirmed: stop before switching anything
+    for d in ids:
+        managerOf(doms[d].result()[0])
+
+    def switch(d):
+        domId, wksId = ids[d]
+        resp = conn.put('/plan/current/domain/'+domId+'/action/switch_domain_workstation', data=wksId)
+        timing[d]['accepted'] = time.time() - start
+        if not resp.ok:
+            raise Exception('HTTP %d' % resp.status_code)
+
+    with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+        futures = {d: pool.submit(switch, d) for d in ids}
+    pending = set()
+    for d, f in futures.items():
+        if f.exception() is None:
+            pending.add(d)
+        else:
+            timing[d]['error'] = 'switch failed: %s' % f.exception()
+
+    # one merged domain query per check until every domain reports its new manager
+    deadline = start + args.timeout
+    while pending and time.time() < deadline:
+        time.sleep(args.interval)
+        planner = waconn.LookupPlanner(conn)
+        current = {d: planner.lookup('domain', d) for d in pending}
+        planner.flush()
+        for d, f in current.items():
+            if f.exception() is None and f.result() and managerOf(f.result()[0]).upper() == switches[d].upper():
+                timing[d]['confirmed'] = time.time() - start
+                pending.discard(d)
+
+    print()
+    print('%-20s %-20s %10s %10s  %s' % ('DOMAIN', 'MANAGER', 'ACCEPTED', 'CONFIRMED', 'RESULT'))
+    for d, m in sorted(switches.items()):
+        t = timing[d]
+        result = t.get('error') or ('ok' if 'confirmed' in t else 'not confirmed')
+        print('%-20s %-20s %10s %10s  %s' % (d, m,
+            '%.1fs' % t['accepted'] if 'accepted' in t else '-',
+            '%.1fs' % t['confirmed'] if 'confirmed' in t else '-', result))
+    print('total %.1fs' % (time.time() - start))
+    return all('confirmed' in timing[d] for d in switches)
+
+if args.switch or args.manifest:
+    switches = {}
+    for s in args.switch or []:
+        d, m = s.split(':', 1)
+        switches[d] = m
+    if args.manifest:
+        with open(args.manifest, newline='') as f:
+            for row in csv.DictReader(f):
+                switches[row['domain']] = row['manager']
+    exit(0 if switchAll(switches) else 1)
+
+
 # first rest call to get the domain id
 url = '/plan/current/domain/query'
 filters = {
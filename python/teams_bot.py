@@ -1,28 +1,30 @@
 import os
-import requests
-import configparser
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from waconn.log import Payload, configure as configure_logging
+from waconn.serve import serve
+from waconn import reply
+from bot_common import config, shared_cache, query_job_all, format_impact, query_jobstreams, rc_evaluation, format_job_line
 from flask import Flask, request, Response
 from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings, TurnContext
-from botbuilder.schema import Activity, ActivityTypes
+from botbuilder.schema import Activity, ActivityTypes, Attachment
 
 app = Flask(__name__)
 
-# Load config
-config = configparser.ConfigParser()
-config.read('config.ini')
-
 MS_APP_ID = os.environ.get("MICROSOFT_APP_ID", "")
 MS_APP_PASSWORD = os.environ.get("MICROSOFT_APP_PASSWORD", "")
 ALLOWED_CHANNEL_ID = config['TEAMS'].get('allowed_channel_id', '').strip()
-API_BASE = config['TWS_API']['base_url']
-API_USER = config['TWS_API']['user']
-API_PASS = config['TWS_API']['password']
-VERIFY_SSL = config['TWS_API'].getboolean('verify_ssl', fallback=True)
-TIMEZONE_OFFSET = config['TWS_API'].getint('timezone_offset', fallback=0)
+BOT_PORT = config['TEAMS'].getint('port', fallback=3978)
+# long answers: several messages ('messages') or one page plus a "next page" card ('cards')
+REPLY_MODE = config['TEAMS'].get('reply_mode', 'messages')
+REPLY_MAX_CHARS = config['TEAMS'].getint('reply_max_chars', fallback=20000)
+REPLY_PAGE_LINES = config['TEAMS'].getint('reply_page_lines', fallback=0) or None
+WORKERS = config['TEAMS'].getint('workers', fallback=1)
+WORKER_TIMEOUT = config['TEAMS'].getint('worker_timeout', fallback=120)
+
+configure_logging(logging.INFO)
 
-logging.basicConfig(level=logging.INFO)
+cursors = reply.CursorStore(shared=shared_cache)
 
 adapter_settings = BotFrameworkAdapterSettings(MS_APP_ID, MS_APP_PASSWORD)
 adapter = BotFrameworkAdapter(adapter_settings)
@@ -30,109 +32,82 @@ adapter = BotFrameworkAdapter(adapter_settings)
 def send_teams_message(turn_context: TurnContext, text: str):
     return turn_context.send_activity(Activity(type=ActivityTypes.message, text=text))
 
-def query_job(job_name):
-    url = f"{API_BASE}/plan/current/job/query"
-    payload = {
-        "filters": {
-            "jobInPlanFilter": {
-                "jobName": job_name
-            }
-        }
-    }
-    headers = {'How-Many': '500', 'Accept': 'application/json'}
-    resp = requests.post(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        json=payload,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def query_jobstreams(js_name):
-    url = f"{API_BASE}/model/jobstream"
-    params = {'key': js_name}
-    headers = {'Accept': 'application/json'}
-    resp = requests.get(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        params=params,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def rc_evaluation(jobstream_id, from_date, to_date):
-    url = f"{API_BASE}/model/jobstream/{jobstream_id}/rc-evaluation"
-    params = {'from': from_date, 'to': to_date}
-    headers = {'Accept': 'application/json'}
-    resp = requests.get(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        params=params,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def format_start_time(utc_str, offset_hours):
-    dt = datetime.strptime(utc_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-    dt_local = dt + timedelta(hours=offset_hours)
-    return dt_local.strftime("%H:%M on %Y-%m-%d")
+def send_teams_card(turn_context: TurnContext, card_json):
+    attachment = Attachment(content_type="application/vnd.microsoft.card.adaptive", content=card_json)
+    return turn_context.send_activity(Activity(type=ActivityTypes.message, attachments=[attachment]))
+
+async def send_job_page(turn_context: TurnContext, jobs, header):
+    """Send one page of jobs, and a "next page" card if more are left."""
+    lines, next_index = reply.page(jobs, format_job_line, 0, REPLY_MAX_CHARS, REPLY_PAGE_LINES)
+    if not lines:
+        return False
+    await send_teams_message(turn_context, header + "\n" + "\n".join(lines))
+    if next_index is not None:
+        rest = jobs[next_index:]
+        await send_teams_card(turn_context, reply.nextPageCard(cursors.put(rest), len(rest)))
+    return True
+
+async def handle_next_page(turn_context: TurnContext, cursor):
+    jobs = cursors.get(cursor)
+    if jobs is None:
+        await send_teams_message(turn_context, "These results have expired, please run the query again.")
+    elif not await send_job_page(turn_context, jobs, "Jobs loaded (continued):"):
+        await send_teams_message(turn_context, "No more jobs.")
 
 async def on_message_activity(turn_context: TurnContext):
     activity = turn_context.activity
-    text = activity.text.strip()
+    # card submits carry their data in value and no text
+    value = activity.value if isinstance(activity.value, dict) else {}
+    text = (activity.text or '').strip()
     channel_id = activity.conversation.id
     user_id = activity.from_property.id
 
     # Only respond in the allowed Teams channel
     if ALLOWED_CHANNEL_ID and channel_id != ALLOWED_CHANNEL_ID:
-        logging.info(f"Ignoring message from channel {channel_id} (not allowed).")
+        logging.info("Ignoring message from channel %s (not allowed).", channel_id)
+        return
+
+    if value.get('action') == 'next_page':
+        await handle_next_page(turn_context, value.get('cursor', ''))
         return
 
     # Remove "Maestro" mention from the beginning if present
     if text.lower().startswith("maestro"):
         text = text[len("maestro"):].lstrip(" :").lstrip()
 
-    logging.info(f"Message received: text='{text}', channel_id='{channel_id}', user_id='{user_id}'")
+    logging.info("Message received: text='%s', channel_id='%s', user_id='%s'", Payload(text, 200), channel_id, user_id)
 
     if text.startswith('!loaded '):
         job_name = text[len('!loaded '):].strip()
         try:
-            jobs = query_job(job_name)
-            logging.info(f"Job query for '{job_name}' returned: {jobs}")
-            if not jobs:
-                await send_teams_message(turn_context, f"No jobs found for '{job_name}'.")
-                logging.info(f"No jobs found for '{job_name}'.")
+            jobs, missing = query_job_all(job_name)
+            logging.info("Job query for '%s' returned %d jobs", job_name, len(jobs))
+            logging.debug("Job query for '%s' returned: %s", job_name, Payload(jobs))
+            if REPLY_MODE == 'cards':
+                sent = await send_job_page(turn_context, jobs, "Jobs loaded:")
             else:
-                lines = []
-                for js in jobs:
-                    try:
-                        line = (
-                            js["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]
-                            + '#' + '\u200b' + js["jobStreamInPlan"]["name"]
-                            + '.' + js["name"]
-                            + '   State: ' + js["status"]["internalStatus"]
-                            + '   Start Time: ' + format_start_time(js["jobStreamInPlan"]["startTime"], TIMEZONE_OFFSET)
-                        )
-                        lines.append(line)
-                    except Exception as ex:
-                        logging.warning(f"Error parsing job entry: {ex}")
-                        continue
-                if lines:
-                    result = "Jobs loaded:\n" + "\n".join(lines)
-                    await send_teams_message(turn_context, result)
-                    logging.info(f"Sent job list to channel: {result}")
-                else:
-                    await send_teams_message(turn_context, f"No jobs found for '{job_name}'.")
-                    logging.info(f"No jobs found for '{job_name}' after parsing.")
+                # each message goes out as soon as its rows are formatted
+                sent = False
+                for chunk in reply.chunks((l for l in map(format_job_line, jobs) if l is not None),
+                                          "Jobs loaded:", REPLY_MAX_CHARS, REPLY_PAGE_LINES):
+                    await send_teams_message(turn_context, chunk)
+                    sent = True
+            if not sent:
+                await send_teams_message(turn_context, f"No jobs found for '{job_name}'.")
+                logging.info("No jobs found for '%s'.", job_name)
+            if missing:
+                await send_teams_message(turn_context, "(no answer from: " + ", ".join(missing) + ")")
         except Exception as e:
             await send_teams_message(turn_context, f"Error querying job: {e}")
-            logging.error(f"Error querying job: {e}")
+            logging.error("Error querying job: %s", e)
+
+    elif text.startswith('!impact '):
+        job_name = text[len('!impact '):].strip()
+        try:
+            await send_teams_message(turn_context, format_impact(job_name))
+        except Exception as e:
+            await send_teams_message(turn_context, f"Error computing impact: {e}")
+            logging.error("Error computing impact: %s", e)
 
     elif text.startswith('!willrun '):
         parts = text[len('!willrun '):].strip().split()
@@ -143,10 +118,10 @@ async def on_message_activity(turn_context: TurnContext):
         today_str = datetime.utcnow().strftime('%Y-%m-%d')
         try:
             jobstreams = query_jobstreams(js_name)
-            logging.info(f"Jobstream query for '{js_name}' returned: {jobstreams}")
+            logging.debug("Jobstream query for '%s' returned: %s", js_name, Payload(jobstreams))
             if not jobstreams:
                 await send_teams_message(turn_context, f"No job streams found for '{js_name}'.")
-                logging.info(f"No job streams found for '{js_name}'.")
+                logging.info("No job streams found for '%s'.", js_name)
             else:
                 if isinstance(jobstreams, dict):
                     jobstreams = [jobstreams]
@@ -165,20 +140,20 @@ async def on_message_activity(turn_context: TurnContext):
                         else:
                             line = f"Job Stream ID: {js_id}\nNo SELECTED dates found."
                         lines.append(line)
-                        logging.info(f"Job Stream ID: {js_id} SELECTED dates: {selected_dates}")
+                        logging.debug("Job Stream ID: %s SELECTED dates: %s", js_id, Payload(selected_dates))
                     except Exception as ex:
-                        logging.warning(f"Error processing job stream entry: {ex}")
+                        logging.warning("Error processing job stream entry: %s", ex)
                         continue
                 if lines:
                     result = "Job Streams RC Evaluation:\n\n" + "\n\n".join(lines)
                     await send_teams_message(turn_context, result)
-                    logging.info(f"Sent job stream RC evaluation to channel.")
+                    logging.info("Sent job stream RC evaluation to channel.")
                 else:
                     await send_teams_message(turn_context, f"No job streams found for '{js_name}' after parsing.")
-                    logging.info(f"No job streams found for '{js_name}' after parsing.")
+                    logging.info("No job streams found for '%s' after parsing.", js_name)
         except Exception as e:
             await send_teams_message(turn_context, f"Error querying job stream: {e}")
-            logging.error(f"Error querying job stream: {e}")
+            logging.error("Error querying job stream: %s", e)
 
 @app.route("/api/messages", methods=["POST"])
 def messages():
@@ -197,4 +172,4 @@ def messages():
     return Response(status=201)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=3978)
\ No newline at end of file
+    serve(app, "0.0.0.0", BOT_PORT, WORKERS, WORKER_TIMEOUT)
\ No newline at end of file
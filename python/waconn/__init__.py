@@ -3,4 +3,36 @@
 # (C) Copyright HCL Technologies Ltd. 2017, 2018 All rights reserved.
 # * Trademark of HCL Technologies Limited
 #############################################################################
-from .conn import WAConn
+import importlib
+
+# the submodules are imported on first use, so a script only pays for what it uses
+_EXPORTS = {
+    'WAConn': '.conn',
+    'PlanWatcher': '.watch',
+    'HTTPCache': '.cache',
+    'JobWaiter': '.wait',
+    'LookupPlanner': '.lookup',
+    'connectAll': '.fanout',
+    'fanoutCall': '.fanout',
+    'fanoutQuery': '.fanout',
+    'PlanGraph': '.depgraph',
+    'PlanSnapshot': '.snapshot',
+    'snapshotFor': '.snapshot',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    module = importlib.import_module(_EXPORTS[name], __name__)
+    # bind every name of the submodule, not only the one asked for
+    for n, m in _EXPORTS.items():
+        if m == _EXPORTS[name]:
+            globals()[n] = getattr(module, n)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,116 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class CacheEntry:
+    def __init__(self, body, headers, etag=None, lastModified=None):
+        self.body = body
+        self.headers = headers
+        self.etag = etag
+        self.lastModified = lastModified
+
+    def size(self):
+        return len(self.body)
+
+
+class HTTPCache:
+    """Validator cache for GET responses.
+
+    Bodies are kept together with their ETag / Last-Modified validators,
+    least recently used first out once maxBytes is exceeded. When spillDir
+    is set, evicted entries are written there instead of being dropped and
+    are loaded back on the next lookup.
+    """
+
+    def __init__(self, maxBytes=16 * 1024 * 1024, spillDir=None):
+        self.maxBytes = maxBytes
+        self.spillDir = spillDir
+        self.entries = OrderedDict()
+        self.used = 0
+        self.lock = threading.Lock()
+        if spillDir:
+            os.makedirs(spillDir, exist_ok=True)
+
+    def _spillPath(self, url):
+        return os.path.join(self.spillDir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _spill(self, url, entry):
+        meta = {'url': url, 'headers': entry.headers,
+                'etag': entry.etag, 'lastModified': entry.lastModified}
+        with open(self._spillPath(url), 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(entry.body)
+
+    def _unspill(self, url):
+        path = self._spillPath(url)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode('utf-8'))
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        os.remove(path)
+        return CacheEntry(body, meta['headers'], meta['etag'], meta['lastModified'])
+
+    def _evict(self):
+        while self.used > self.maxBytes and self.entries:
+            url, entry = self.entries.popitem(last=False)
+            self.used -= entry.size()
+            if self.spillDir:
+                self._spill(url, entry)
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+                return entry
+            if self.spillDir:
+                entry = self._unspill(url)
+                if entry is not None:
+                    self.entries[url] = entry
+                    self.used += entry.size()
+                    self._evict()
+            return entry
+
+    def put(self, url, body, headers):
+        etag = headers.get('ETag')
+        lastModified = headers.get('Last-Modified')
+        if not etag and not lastModified:
+            return
+        entry = CacheEntry(body, dict(headers), etag, lastModified)
+        if entry.size() > self.maxBytes:
+            return
+        with self.lock:
+            old = self.entries.pop(url, None)
+            if old is not None:
+                self.used -= old.size()
+            self.entries[url] = entry
+            self.used += entry.size()
+            self._evict()
+
+    def validators(self, url):
+        """Conditional request headers for url, empty if nothing is cached."""
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.lastModified:
+                headers['If-Modified-Since'] = entry.lastModified
+        return headers
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
@@ -3,19 +3,38 @@
 # (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
 # * Trademark of HCL Technologies Limited
 #############################################################################
-import requests
+import time
 import uuid
+from contextlib import nullcontext
+from urllib.parse import urlencode
 from .prop import readProps
+from .cache import HTTPCache
+from .limit import budgetFor, requestKind
+from .log import logger, Payload
+from .hedge import LatencyTracker, endpoint, hedged
+from .pagesize import PageSizer
 
 import logging
-from http.client import HTTPConnection
-#HTTPConnection.debuglevel = 1
 
-logging.basicConfig() # you need to initialize logging, otherwise you will not see anything from requests
-#logging.getLogger().setLevel(logging.DEBUG)
-requests_log = logging.getLogger("requests.packages.urllib3")
-#requests_log.setLevel(logging.DEBUG)
-requests_log.propagate = True
+# requests (with urllib3 and http.client) is most of the import time of a
+# script, it is only imported when the first request is sent
+requests = None
+
+
+def _loadRequests():
+    global requests
+    if requests is None:
+        import requests as _requests
+        #from http.client import HTTPConnection
+        #HTTPConnection.debuglevel = 1
+
+        logging.basicConfig() # you need to initialize logging, otherwise you will not see anything from requests
+        #logging.getLogger().setLevel(logging.DEBUG)
+        requests_log = logging.getLogger("requests.packages.urllib3")
+        #requests_log.setLevel(logging.DEBUG)
+        requests_log.propagate = True
+        requests = _requests
+    return requests
 
 
 class WAConn:
@@ -23,16 +42,32 @@ class WAConn:
     config = {}
     prefix = ''
     hostIdx = 0
+    cache = None
+    latency = None
 
-    def __init__(self, propFile, pref):
-        self.config = readProps(propFile)
+    def __init__(self, propFile, pref, cache=None, env=None, config=None):
+        # config: the settings readProps() would return, when they do not come from a file
+        self.config = config if config is not None else readProps(propFile, env)
         self.prefix = pref
+        if cache is not None:
+            self.cache = cache
+        elif self.config.get('cacheSize'):
+            self.cache = HTTPCache(self.config['cacheSize'], self.config.get('cacheDir'))
+        self.pageSizer = PageSizer(stateFile=self.config.get('pageState'), **self.config.get('pages', {}))
+        if self.config.get('hedge'):
+            self.latency = LatencyTracker(self.config['hedge']['percentile'], minDelay=self.config['hedge']['minDelay'])
 
     def __str__(self):
         return 'WAConn (%s, %s)' % (self.config, self.prefix)
 
-    def request(self, method, uri, headers=None, params=None, json=None, data=None):
+    def request(self, method, uri, headers=None, params=None, json=None, data=None, host=None):
+        """Send a request, to host only if given, else to the configured hosts.
+
+        The host that answered is in resp.waHost: a Next-Page token is only
+        known to the host that issued it, the next page must go there.
+        """
 
+        _loadRequests()
         headers = headers or {}
         if 'Content-Type' not in headers:
             headers['Content-Type'] = 'application/json'
@@ -43,44 +78,99 @@ class WAConn:
         if 'Request-Id' not in headers:
             headers['Request-Id'] = self.reqId
 
-        retry = True
-        hosts = self.config['hosts']
-        retries = 0
+        # conditional GET: the cache key ignores the host, master and backup serve the same objects
+        cacheKey = None
+        if self.cache is not None and method == 'GET':
+            cacheKey = self.prefix + uri + ('?' + urlencode(sorted(params.items())) if params else '')
+            if 'If-None-Match' not in headers and 'If-Modified-Since' not in headers:
+                headers.update(self.cache.validators(cacheKey))
+
+        hosts = [host] if host else self.config['hosts']
         resp = None
-        while retry and retries < len(hosts):
-            retry = False
-            url = hosts[self.hostIdx] + self.prefix + uri
-            print('Connecting to {} for {}'.format(url, method))
+        if self.latency is not None and len(hosts) > 1 and requestKind(method, uri) == 'read':
+            # hedged read: ask the next host too if the current one is slower than usual
+            order = hosts[self.hostIdx:] + hosts[:self.hostIdx]
             try:
-                resp = requests.request(
-                    method, url, json=json, data=data, headers=headers,
-                    auth=(self.config['user'], self.config['pwd']),
-                    verify=self.config['verify']
-                )
+                host, resp = hedged(lambda h: self._send(h, method, uri, headers, json, data, params),
+                                    order, self.latency.delay(endpoint(method, uri)))
+                if host != order[0]:
+                    logger.debug('Hedged request answered first by %s', host)
             except requests.exceptions.ConnectionError as error:
-                print('Connection error: ' + str(error))
-                retry = True
-                self.hostIdx += 1
-                if self.hostIdx >= len(hosts):
-                    self.hostIdx = 0
-                retries += 1
+                logger.warning('Connection error on every host for %s: %s', uri, error)
+        else:
+            retry = True
+            retries = 0
+            while retry and retries < len(hosts):
+                retry = False
+                host = hosts[self.hostIdx % len(hosts)]
+                try:
+                    resp = self._send(host, method, uri, headers, json, data, params)
+                except requests.exceptions.ConnectionError as error:
+                    logger.warning('Connection error on %s: %s', host, error)
+                    retry = True
+                    if len(hosts) > 1:
+                        self.hostIdx += 1
+                        if self.hostIdx >= len(hosts):
+                            self.hostIdx = 0
+                    retries += 1
 
         if resp is not None:
-            print('Result: {}'.format(resp.status_code))
+            logger.debug('Result: %s', resp.status_code)
             if not resp.ok:
                 try:
                     json_resp = resp.json()
                 except Exception:
                     json_resp = None
                 if json_resp and 'messages' in json_resp:
-                    print("Error from server:")
-                    for m in json_resp['messages']:
-                        print(" %s" % (m))
+                    logger.error('Error from server for %s %s: %s', method, uri,
+                                 '; '.join(str(m) for m in json_resp['messages']))
             else:
                 resp.raise_for_status()
         else:
             raise Exception("No response received from server.")
 
+        if cacheKey is not None:
+            if resp.status_code == 304:
+                entry = self.cache.get(cacheKey)
+                if entry is None:
+                    # evicted since the validators were sent, fetch it again
+                    headers.pop('If-None-Match', None)
+                    headers.pop('If-Modified-Since', None)
+                    return self.request(method, uri, headers=headers, params=params, json=json, data=data)
+                resp = self._fromCache(entry, resp)
+            elif resp.status_code == 200:
+                self.cache.put(cacheKey, resp.content, resp.headers)
+
+        resp.waHost = host
+        return resp
+
+    def _send(self, host, method, uri, headers, json, data, params=None):
+        url = host + self.prefix + uri
+        kind = requestKind(method, uri)
+        logger.debug('Connecting to %s for %s, body %s', url, method, Payload(json if json is not None else data))
+        if self.config.get('limits'):
+            budget = budgetFor(host, kind, self.config['limits'])
+        else:
+            budget = nullcontext()
+        with budget:
+            start = time.monotonic()
+            resp = requests.request(
+                method, url, params=params, json=json, data=data, headers=headers,
+                auth=(self.config['user'], self.config['pwd']),
+                verify=self.config['verify']
+            )
+        if self.latency is not None and kind == 'read':
+            self.latency.record(endpoint(method, uri), time.monotonic() - start)
+        return resp
+
+    def _fromCache(self, entry, notModified):
+        resp = requests.models.Response()
+        resp.status_code = 200
+        resp.reason = 'OK (cached)'
+        resp._content = entry.body
+        resp.headers = requests.structures.CaseInsensitiveDict(entry.headers)
+        resp.url = notModified.url
+        resp.request = notModified.request
         return resp
 
     def put(self, uri, json=None, data=None, headers=None):
@@ -93,3 +183,39 @@ class WAConn:
         return self.request('GET', uri, params=params)
 
 
+
+    def query(self, uri, json, howMany=None):
+        """Run a paged query, yield one page (a list) at a time.
+
+        The Next-Page token returned by the server is sent back until the
+        last page, so the whole result is never held in memory. Unless
+        howMany is given, the page size is tuned by self.pageSizer from the
+        latency and size of the previous pages.
+        """
+        nextPage = None
+        host = None
+        while True:
+            size = howMany or self.pageSizer.size(uri)
+            headers = {'How-Many': str(size)}
+            if nextPage:
+                headers['Next-Page'] = nextPage
+            start = time.monotonic()
+            # the next pages go to the host that answered the first one
+            resp = self.request('POST', uri, headers=headers, json=json, host=host)
+            if resp.status_code >= 500 and not howMany and self.pageSizer.failed(uri):
+                # busy server: retry the same page smaller
+                continue
+            if not resp.ok:
+                # the body is an error report, not a page
+                resp.raise_for_status()
+            page = resp.json()
+            if not howMany:
+                self.pageSizer.observe(uri, size, len(page), time.monotonic() - start, len(resp.content))
+            if page:
+                yield page
+            nextPage = resp.headers.get('Next-Page')
+            host = resp.waHost
+            if not nextPage or not page:
+                break
+        if not howMany:
+            self.pageSizer.save()
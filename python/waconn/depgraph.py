@@ -0,0 +1,200 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import threading
+import time
+from collections import deque
+
+from .log import logger
+
+
+def jobName(job):
+    js = job.get('jobStreamInPlan') or {}
+    wks = (js.get('workstationKey') or {}).get('name', '')
+    return '%s#%s.%s' % (wks, js.get('name', ''), job.get('name', ''))
+
+
+def predecessorNames(job):
+    """WORKSTATION#JOBSTREAM.JOB names of the jobs a job in plan waits for.
+
+    They come from the dependencies of the job in plan: internalPredecessors
+    name a job (jobName) of the same job stream, externalPredecessors a job
+    of another one (workstationName, jobStreamName, jobName). An external
+    predecessor on a whole job stream, without jobName, is not a job and is
+    left out.
+    """
+    deps = job.get('dependencies') or {}
+    js = job.get('jobStreamInPlan') or {}
+    wks = (js.get('workstationKey') or {}).get('name', '')
+    names = ['%s#%s.%s' % (wks, js.get('name', ''), p['jobName'])
+             for p in deps.get('internalPredecessors') or () if p.get('jobName')]
+    names += ['%s#%s.%s' % (p['workstationName'], p['jobStreamName'], p['jobName'])
+              for p in deps.get('externalPredecessors') or ()
+              if p.get('workstationName') and p.get('jobStreamName') and p.get('jobName')]
+    return names
+
+
+def estimatedDuration(job):
+    return job.get('estimatedDuration') or 0
+
+
+class PlanGraph:
+    """In-memory dependency DAG of the jobs in the current plan.
+
+    Nodes are job in plan ids. The graph is built once from a full plan
+    query and then kept current with update()/remove(), e.g. from the
+    events of a PlanWatcher. Closures and critical paths are computed from
+    memory, without calling the server. They raise an exception if no job
+    loaded carries its dependencies: an empty answer would then look like
+    a job releasing nothing.
+    """
+
+    def __init__(self, duration=estimatedDuration):
+        self.duration = duration
+        self.jobs = {}
+        self.byName = {}
+        self.preds = {}
+        self.succs = {}
+        self.unresolved = {}
+        # ids of the jobs that came with their dependencies
+        self.described = set()
+        self.lock = threading.RLock()
+        self.built = None
+
+    def _link(self, jobId, predId):
+        self.preds.setdefault(jobId, set()).add(predId)
+        self.succs.setdefault(predId, set()).add(jobId)
+
+    def _unlink(self, jobId):
+        for p in self.preds.pop(jobId, ()):
+            self.succs.get(p, set()).discard(jobId)
+        for refs in self.unresolved.values():
+            refs.discard(jobId)
+
+    def update(self, job):
+        """Add a job, or replace it and its predecessor links."""
+        with self.lock:
+            jobId = job['id']
+            old = self.jobs.get(jobId)
+            if old is not None:
+                self.byName.get(jobName(old), set()).discard(jobId)
+                self._unlink(jobId)
+            self.jobs[jobId] = job
+            name = jobName(job)
+            self.byName.setdefault(name, set()).add(jobId)
+            if 'dependencies' in job:
+                self.described.add(jobId)
+            else:
+                self.described.discard(jobId)
+            for ref in predecessorNames(job):
+                if self.byName.get(ref):
+                    for p in self.byName[ref]:
+                        self._link(jobId, p)
+                else:
+                    self.unresolved.setdefault(ref, set()).add(jobId)
+            # jobs added earlier that were waiting for this name
+            for waiting in self.unresolved.pop(name, ()):
+                self._link(waiting, jobId)
+
+    def remove(self, jobId):
+        with self.lock:
+            job = self.jobs.pop(jobId, None)
+            self.described.discard(jobId)
+            if job is not None:
+                self.byName.get(jobName(job), set()).discard(jobId)
+            self._unlink(jobId)
+            for s in self.succs.pop(jobId, ()):
+                self.preds.get(s, set()).discard(jobId)
+
+    def build(self, jobs):
+        """Rebuild from an iterable of jobs (or of pages of jobs)."""
+        with self.lock:
+            self.__init__(self.duration)
+            for j in jobs:
+                for job in (j if isinstance(j, list) else [j]):
+                    self.update(job)
+            self.built = time.time()
+            if self.jobs and len(self.described) < len(self.jobs):
+                logger.warning('%d of %d jobs in plan came without their dependencies',
+                               len(self.jobs) - len(self.described), len(self.jobs))
+        return self
+
+    def checkDependencies(self):
+        if self.jobs and not self.described:
+            raise Exception('the %d jobs in plan came without their dependencies, '
+                            'the jobs they release are unknown' % len(self.jobs))
+
+    def load(self, conn, filters=None, howMany=None):
+        """Build the graph from /plan/current/job/query, one page at a time."""
+        filters = filters or {"filters": {"jobInPlanFilter": {"jobName": "*"}}}
+        return self.build(conn.query('/plan/current/job/query', filters, howMany=howMany))
+
+    def onEvent(self, event):
+        """PlanWatcher subscriber keeping the graph current."""
+        if event['type'] == 'removed':
+            self.remove(event['id'])
+        else:
+            self.update(event['new'])
+
+    def find(self, name):
+        """Ids of the jobs named WORKSTATION#JOBSTREAM.JOB (or just JOB)."""
+        with self.lock:
+            if '#' in name:
+                return sorted(self.byName.get(name, ()))
+            return sorted(i for i, j in self.jobs.items() if j.get('name') == name)
+
+    def _closure(self, start, edges):
+        with self.lock:
+            self.checkDependencies()
+            seen = set()
+            todo = deque(start if isinstance(start, (list, set, tuple)) else [start])
+            while todo:
+                n = todo.popleft()
+                for m in edges.get(n, ()):
+                    if m not in seen:
+                        seen.add(m)
+                        todo.append(m)
+            return seen
+
+    def successors(self, jobId):
+        """Every job released, directly or not, by jobId."""
+        return self._closure(jobId, self.succs)
+
+    def predecessors(self, jobId):
+        """Every job jobId depends on, directly or not."""
+        return self._closure(jobId, self.preds)
+
+    def criticalPath(self, jobId):
+        """(estimated duration, [ids]) of the longest chain starting at jobId."""
+        with self.lock:
+            self.checkDependencies()
+            # iterative post-order walk, best[n] = (duration from n, next job on the path)
+            best = {}
+            visiting = set()
+            stack = [(jobId, False)]
+            while stack:
+                n, expanded = stack.pop()
+                if expanded:
+                    visiting.discard(n)
+                    tail, nxt = 0, None
+                    for s in self.succs.get(n, ()):
+                        # successors still being visited close a cycle, do not follow it
+                        if s in best and (nxt is None or best[s][0] > tail):
+                            tail, nxt = best[s][0], s
+                    cost = self.duration(self.jobs[n]) if n in self.jobs else 0
+                    best[n] = (cost + tail, nxt)
+                    continue
+                if n in best or n in visiting:
+                    continue
+                visiting.add(n)
+                stack.append((n, True))
+                for s in self.succs.get(n, ()):
+                    if s not in best and s not in visiting:
+                        stack.append((s, False))
+
+            path = [jobId]
+            while best[path[-1]][1] is not None:
+                path.append(best[path[-1]][1])
+            return best[jobId][0], path
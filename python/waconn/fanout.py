@@ -0,0 +1,82 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import copy
+from concurrent.futures import wait
+
+from .conn import WAConn
+from .prop import listEnvironments
+from .threads import spawn
+
+
+class FanoutResult:
+    """Merged answer of a fan-out call.
+
+    results holds every returned object tagged with an 'environment' key,
+    errors maps environment to the exception it raised, and timedOut lists
+    the environments that had not answered when the timeout expired.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.errors = {}
+        self.timedOut = []
+
+    @property
+    def complete(self):
+        return not self.errors and not self.timedOut
+
+
+def connectAll(propFile, pref, envs=None):
+    """{environment: WAConn} for envs, or for every server section in propFile."""
+    if envs is None:
+        envs = listEnvironments(propFile)
+    return {env: WAConn(propFile, pref, env=env) for env in envs}
+
+
+def fanoutCall(tasks, timeout=None):
+    """Run {environment: callable} concurrently and merge what they return.
+
+    A callable may return a list of objects or a single object. Results that
+    are not back within timeout seconds are left out and their environments
+    listed in timedOut; their daemon threads are neither waited for nor keep
+    the process from exiting.
+    """
+    answer = FanoutResult()
+    if not tasks:
+        return answer
+    futures = {spawn(task, name='waconn-fanout-%s' % env): env for env, task in tasks.items()}
+    done, notDone = wait(futures, timeout=timeout)
+
+    for f in futures:
+        env = futures[f]
+        if f in notDone:
+            answer.timedOut.append(env)
+            continue
+        try:
+            r = f.result()
+        except Exception as e:
+            answer.errors[env] = e
+            continue
+        if r is None:
+            continue
+        for o in (r if isinstance(r, list) else [r]):
+            if isinstance(o, dict):
+                o['environment'] = env
+            answer.results.append(o)
+    return answer
+
+
+def fanoutQuery(conns, uri, json, headers=None, timeout=None):
+    """POST the same query to every {environment: WAConn} in conns."""
+    def task(conn):
+        def run():
+            # WAConn.request fills in the headers dict, one copy per thread
+            resp = conn.post(uri, json=json, headers=copy.copy(headers))
+            # an error body is not a result: the environment goes to errors
+            resp.raise_for_status()
+            return resp.json()
+        return run
+    return fanoutCall({env: task(conn) for env, conn in conns.items()}, timeout)
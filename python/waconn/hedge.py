@@ -0,0 +1,86 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import re
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from .threads import spawn
+
+
+# path segments that name a kind of object or an action, the others are ids
+_WORD = re.compile('[a-z_-]*')
+
+
+def endpoint(method, uri):
+    """'METHOD /uri' with the ids in the path replaced by '*'."""
+    return method + ' ' + '/'.join(p if _WORD.fullmatch(p) else '*' for p in uri.split('/'))
+
+
+class LatencyTracker:
+    """Recent read latencies per endpoint, used to decide when to hedge.
+
+    A single object GET and a page of a plan query take very different
+    times, so the samples are kept per endpoint (see endpoint()), like the
+    page sizes of PageSizer. delay(endpoint) is the given percentile of its
+    last window samples, never below minDelay; until enough samples are
+    collected it is initialDelay.
+    """
+
+    def __init__(self, percentile=95, window=200, minDelay=0.05, initialDelay=1.0):
+        self.percentile = percentile
+        self.window = window
+        self.minDelay = minDelay
+        self.initialDelay = initialDelay
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, endpoint):
+        with self.lock:
+            samples = self.samples.get(endpoint, ())
+            if len(samples) < 20:
+                return self.initialDelay
+            ordered = sorted(samples)
+        i = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.minDelay, ordered[i])
+
+
+def hedged(send, hosts, delay):
+    """Call send(host) on hosts[0], then on the next host if no answer in delay.
+
+    Returns (host, response) of the first call that completes without an
+    exception. The slower call is abandoned: it is cancelled if it has not
+    started yet, otherwise its result is simply dropped, and its daemon
+    thread does not hold the process at exit. The exception of the last
+    host is raised if every call fails.
+    """
+    futures = {spawn(send, hosts[0], name='waconn-hedge'): hosts[0]}
+    done, _ = wait(futures, timeout=delay)
+    remaining = list(hosts[1:])
+    error = None
+    while True:
+        if not done and remaining:
+            h = remaining.pop(0)
+            futures[spawn(send, h, name='waconn-hedge')] = h
+        done, notDone = wait(futures, return_when=FIRST_COMPLETED)
+        for f in done:
+            host = futures.pop(f)
+            try:
+                resp = f.result()
+            except Exception as e:
+                error = e
+                continue
+            for other in notDone:
+                other.cancel()
+            return host, resp
+        if not futures and not remaining:
+            raise error
+        # a call failed: hedge right away with the next host, if any
+        done = set()
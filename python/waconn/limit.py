@@ -0,0 +1,162 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import os
+import re
+import threading
+import time
+
+KINDS = ('read', 'action')
+
+
+def requestKind(method, uri):
+    """'read' for GETs and queries, 'action' for everything else."""
+    if method == 'GET' or uri.rstrip('/').endswith('/query'):
+        return 'read'
+    return 'action'
+
+
+class TokenBucket:
+    """Classic token bucket shared by the threads of one process."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a locked file, shared by processes."""
+
+    def __init__(self, path, rate, burst=None):
+        TokenBucket.__init__(self, rate, burst)
+        self.path = path
+
+    def acquire(self):
+        import fcntl
+        while True:
+            with open(self.path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    tokens, stamp = f.read().split()
+                    self.tokens, self.stamp = float(tokens), float(stamp)
+                except ValueError:
+                    self.tokens, self.stamp = self.burst, time.time()
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + max(0, now - self.stamp) * self.rate)
+                self.stamp = now
+                wait = 0
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                else:
+                    wait = (1 - self.tokens) / self.rate
+                f.seek(0)
+                f.truncate()
+                f.write('%r %r' % (self.tokens, self.stamp))
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class FileSlots:
+    """Counting semaphore made of lock files, shared by processes.
+
+    A slot is held by keeping an exclusive flock on one of the files, so a
+    crashed process gives its slot back automatically.
+    """
+
+    def __init__(self, prefix, count):
+        self.paths = ['%s.slot%d' % (prefix, i) for i in range(count)]
+        self.local = threading.local()
+
+    def acquire(self):
+        import fcntl
+        while True:
+            for p in self.paths:
+                f = open(p, 'a')
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    continue
+                self.local.__dict__.setdefault('held', []).append(f)
+                return
+            time.sleep(0.05)
+
+    def release(self):
+        self.local.held.pop().close()
+
+
+class Budget:
+    """Rate and concurrency budget for one kind of request on one host."""
+
+    def __init__(self, rate=None, burst=None, inFlight=None, prefix=None):
+        self.bucket = None
+        self.slots = None
+        if rate:
+            if prefix:
+                self.bucket = FileTokenBucket(prefix + '.bucket', rate, burst)
+            else:
+                self.bucket = TokenBucket(rate, burst)
+        if inFlight:
+            if prefix:
+                self.slots = FileSlots(prefix, inFlight)
+            else:
+                self.slots = threading.BoundedSemaphore(inFlight)
+
+    def __enter__(self):
+        if self.bucket is not None:
+            self.bucket.acquire()
+        if self.slots is not None:
+            self.slots.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        if self.slots is not None:
+            self.slots.release()
+        return False
+
+
+_budgets = {}
+_budgetsLock = threading.Lock()
+
+
+def budgetFor(host, kind, limits):
+    """Budget shared by every WAConn of this process for host and kind.
+
+    limits is the 'limits' entry of readProps: '<kind>_rate',
+    '<kind>_burst', '<kind>_in_flight' and an optional 'dir' where the
+    state is shared with other processes.
+    """
+    with _budgetsLock:
+        key = (host, kind)
+        if key not in _budgets:
+            prefix = None
+            if limits.get('dir'):
+                os.makedirs(limits['dir'], exist_ok=True)
+                prefix = os.path.join(limits['dir'], re.sub(r'[^A-Za-z0-9.-]', '_', host) + '.' + kind)
+            _budgets[key] = Budget(limits.get(kind + '_rate'), limits.get(kind + '_burst'),
+                                   limits.get(kind + '_in_flight'), prefix)
+        return _budgets[key]
@@ -0,0 +1,130 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import itertools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+logger = logging.getLogger('waconn')
+
+# default size cap, in characters, for payloads written to the log
+maxPayload = int(os.environ.get('WACONN_LOG_PAYLOAD', '1000'))
+
+
+class Payload:
+    """Lazily formatted, size capped log argument.
+
+    Nothing is formatted unless the record is actually emitted, and lists
+    stop being formatted as soon as the cap is reached:
+
+        logger.debug('query returned %s', Payload(jobs))
+    """
+
+    __slots__ = ('obj', 'limit')
+
+    def __init__(self, obj, limit=None):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self):
+        limit = self.limit or maxPayload
+        if isinstance(self.obj, (list, tuple)):
+            parts = []
+            size = 0
+            for i, o in enumerate(self.obj):
+                s = repr(o)
+                parts.append(s)
+                size += len(s) + 2
+                if size > limit:
+                    rest = len(self.obj) - i - 1
+                    text = '[' + ', '.join(parts)
+                    return text[:limit] + '... (%d more items)]' % rest
+            return '[' + ', '.join(parts) + ']'
+        s = str(self.obj)
+        if len(s) > limit:
+            return s[:limit] + '... (%d more chars)' % (len(s) - limit)
+        return s
+
+    __repr__ = __str__
+
+
+class SampleFilter(logging.Filter):
+    """Keep one in every `every` records below WARNING, and all the others."""
+
+    def __init__(self, every):
+        logging.Filter.__init__(self)
+        self.every = every
+        self.counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        return next(self.counter) % self.every == 0
+
+
+def toggleDebug(*args):
+    """Switch the root logger between DEBUG and its configured level."""
+    root = logging.getLogger()
+    if root.level == logging.DEBUG:
+        root.setLevel(getattr(toggleDebug, 'previous', logging.INFO))
+    else:
+        toggleDebug.previous = root.level
+        root.setLevel(logging.DEBUG)
+    logger.warning('log level is now %s', logging.getLevelName(root.level))
+
+
+def watchDebugFile(path, interval=2.0):
+    """Log at DEBUG while path exists, checked every interval seconds.
+
+    The check runs in a daemon thread, started again in every forked
+    child, so it also reaches the workers of a gunicorn bot.
+    """
+    def run():
+        debug = False
+        while True:
+            if os.path.exists(path) != debug:
+                debug = not debug
+                toggleDebug()
+            time.sleep(interval)
+
+    def start():
+        threading.Thread(target=run, name='waconn-debug-file', daemon=True).start()
+
+    start()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start)
+
+
+def configure(level=logging.INFO):
+    """Set up logging for a script or bot.
+
+    WACONN_LOG_LEVEL (a level name, e.g. debug) overrides level and is
+    ignored if it is not one, WACONN_LOG_SAMPLE=N keeps only 1 in N
+    records below WARNING, and SIGUSR1 toggles debug logging at runtime.
+    Under gunicorn SIGUSR1 reopens the log files and is left alone: set
+    WACONN_DEBUG_FILE to a path instead, debug logging is on while that
+    file exists.
+    """
+    name = os.environ.get('WACONN_LOG_LEVEL', '').strip().upper()
+    if isinstance(logging.getLevelName(name), int):
+        level = name
+    logging.basicConfig()
+    logging.getLogger().setLevel(level)
+    sample = int(os.environ.get('WACONN_LOG_SAMPLE', '1'))
+    if sample > 1:
+        for h in logging.getLogger().handlers:
+            h.addFilter(SampleFilter(sample))
+    if os.environ.get('WACONN_DEBUG_FILE'):
+        watchDebugFile(os.environ['WACONN_DEBUG_FILE'])
+    if hasattr(signal, 'SIGUSR1') and 'gunicorn' not in sys.modules:
+        try:
+            signal.signal(signal.SIGUSR1, toggleDebug)
+        except ValueError:
+            # not in the main thread
+            pass
@@ -0,0 +1,131 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+from concurrent.futures import Future
+
+
+def _name(o):
+    if 'name' in o:
+        return o['name']
+    for k in ('jobDefinitionKey', 'jobStreamKey', 'key'):
+        if k in o and 'name' in o[k]:
+            return o[k]['name']
+    return None
+
+
+# kind: (query uri, filter name, name field in the filter)
+KINDS = {
+    'job': ('/plan/current/job/query', 'jobInPlanFilter', 'jobName'),
+    'jobstreamInPlan': ('/plan/current/jobstream/query', 'jobStreamInPlanFilter', 'jobStreamName'),
+    'domain': ('/plan/current/domain/query', 'domainInPlanFilter', 'domainName'),
+    'workstationInPlan': ('/plan/current/workstation/query', 'workstationInPlanFilter', 'workstationName'),
+    'workstation': ('/model/workstation/header/query', 'workstationFilter', 'workstationName'),
+    'jobdefinition': ('/model/jobdefinition/header/query', 'jobDefinitionFilter', 'jobDefinitionName'),
+    'jobstream': ('/model/jobstream/header/query', 'jobstreamFilter', 'jobStreamName'),
+}
+
+
+def _commonPrefix(names):
+    first = min(names)
+    last = max(names)
+    i = 0
+    while i < len(first) and first[i] == last[i]:
+        i += 1
+    return first[:i]
+
+
+def _wildcard(name):
+    return '*' in name or '@' in name or '?' in name
+
+
+class LookupPlanner:
+    """Collect name lookups and resolve them with as few queries as possible.
+
+    lookup() only records the request and returns a Future. flush() groups
+    the pending lookups by kind and by their other filter fields, then
+    clusters the names by their first minPrefix characters and sends one
+    "<common prefix>*" query per cluster, read to its last page. Results
+    are matched back to each name locally (TWS names are compared
+    case-insensitively) and every Future resolves with the list of
+    matching objects, as an individual query would return. minPrefix
+    keeps the merged queries selective: names sharing fewer characters
+    are not merged. When a merged query returns objects whose name cannot
+    be read, its names are queried one by one instead.
+    """
+
+    def __init__(self, conn, howMany=500, minPrefix=3):
+        self.conn = conn
+        self.howMany = howMany
+        self.minPrefix = minPrefix
+        self.pending = []
+
+    def lookup(self, kind, name, **extra):
+        future = Future()
+        self.pending.append((kind, name, extra, future))
+        return future
+
+    def _query(self, kind, name, extra):
+        uri, filterName, field = KINDS[kind]
+        f = dict(extra)
+        f[field] = name
+        # every page, so a merged query is never cut at How-Many; raises on an error response
+        return [o for page in self.conn.query(uri, {"filters": {filterName: f}}, howMany=self.howMany)
+                for o in page]
+
+    def _resolve(self, kind, extra, lookups):
+        names = sorted(set(n.upper() for n, _ in lookups))
+        if len(names) == 1:
+            rows = self._query(kind, lookups[0][0], extra)
+            for _, future in lookups:
+                future.set_result(rows)
+            return
+
+        prefix = _commonPrefix(names)
+        rows = self._query(kind, prefix + '*', extra)
+        # rows without a name cannot be matched
+        incomplete = False
+
+        byName = {}
+        for r in rows:
+            n = _name(r)
+            if n is None:
+                incomplete = True
+            else:
+                byName.setdefault(n.upper(), []).append(r)
+
+        for n, future in lookups:
+            if incomplete:
+                future.set_result(self._query(kind, n, extra))
+            else:
+                future.set_result(byName.get(n.upper(), []))
+
+    def flush(self):
+        """Run the queries for every pending lookup."""
+        pending, self.pending = self.pending, []
+        groups = {}
+        for kind, name, extra, future in pending:
+            if _wildcard(name):
+                # already a pattern, nothing to merge with
+                try:
+                    future.set_result(self._query(kind, name, extra))
+                except Exception as e:
+                    future.set_exception(e)
+                continue
+            key = (kind, tuple(sorted(extra.items())), name[:self.minPrefix].upper())
+            groups.setdefault(key, []).append((name, future))
+
+        for (kind, extra, _), lookups in groups.items():
+            try:
+                self._resolve(kind, dict(extra), lookups)
+            except Exception as e:
+                for _, future in lookups:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def resolve(self, kind, names, **extra):
+        """Look up all names at once, return {name: [objects]}."""
+        futures = {n: self.lookup(kind, n, **extra) for n in names}
+        self.flush()
+        return {n: f.result() for n, f in futures.items()}
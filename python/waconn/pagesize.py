@@ -0,0 +1,75 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import json
+import os
+import threading
+
+
+class PageSizer:
+    """How-Many controller for paged queries, tuned per endpoint.
+
+    After each page the size grows by `grow` when the page came back full,
+    faster than half the target latency and under maxBytes, and is cut by
+    `shrink` when it was slower than the target, bigger than maxBytes or
+    failed. Sizes stay within [minSize, maxSize]. With stateFile set the
+    tuned sizes are saved there and reused by the next run.
+    """
+
+    def __init__(self, minSize=50, maxSize=2000, initial=500, target=2.0,
+                 maxBytes=8 * 1024 * 1024, grow=1.5, shrink=0.5, stateFile=None):
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.initial = initial
+        self.target = target
+        self.maxBytes = maxBytes
+        self.grow = grow
+        self.shrink = shrink
+        self.stateFile = stateFile
+        self.sizes = {}
+        self.lock = threading.Lock()
+        if stateFile:
+            try:
+                with open(stateFile) as f:
+                    self.sizes = {k: int(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                pass
+
+    def _clamp(self, size):
+        return int(max(self.minSize, min(self.maxSize, size)))
+
+    def size(self, endpoint):
+        with self.lock:
+            return self._clamp(self.sizes.get(endpoint, self.initial))
+
+    def observe(self, endpoint, requested, returned, seconds, nbytes):
+        """Record a page and return the size to use for the next one."""
+        with self.lock:
+            size = self.sizes.get(endpoint, self.initial)
+            if seconds > self.target or nbytes > self.maxBytes:
+                size = size * self.shrink
+            elif returned >= requested and seconds < self.target / 2 and nbytes < self.maxBytes / 2:
+                size = size * self.grow
+            self.sizes[endpoint] = self._clamp(size)
+            return self.sizes[endpoint]
+
+    def failed(self, endpoint):
+        """Shrink after a failed page, return False if already at minSize."""
+        with self.lock:
+            size = self.sizes.get(endpoint, self.initial)
+            if size <= self.minSize:
+                return False
+            self.sizes[endpoint] = self._clamp(size * self.shrink)
+            return True
+
+    def save(self):
+        if not self.stateFile:
+            return
+        with self.lock:
+            sizes = dict(self.sizes)
+        tmp = self.stateFile + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(sizes, f)
+        os.replace(tmp, self.stateFile)
@@ -5,42 +5,166 @@
 #############################################################################
 import configparser
 import base64
+import copy
+import os
+import threading
 
-def readProps(inifile):
+# parsed ini files and their properties, by path, reused while the file is unchanged
+_parsed = {}
+_props = {}
+_lock = threading.Lock()
+
+def sectionName(env=None):
+    if not env or env == 'default':
+        return 'WASERVER'
+    return 'WASERVER:' + env
+
+
+def _stamp(inifile):
+    try:
+        st = os.stat(inifile)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read(inifile):
+    """Parsed inifile, parsed again only when its mtime or size changed."""
+    path = os.path.abspath(inifile)
+    stamp = _stamp(path)
+    with _lock:
+        hit = _parsed.get(path)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+    config = configparser.ConfigParser(allow_no_value=True)
+    config.read(path)
+    with _lock:
+        _parsed[path] = (stamp, config)
+    return config
+
+
+def listEnvironments(inifile):
+    """Names of the [WASERVER:<name>] sections, 'default' for a plain [WASERVER]."""
+    config = _read(inifile)
+    envs = []
+    for s in config.sections():
+        if s == 'WASERVER':
+            envs.append('default')
+        elif s.startswith('WASERVER:'):
+            envs.append(s[len('WASERVER:'):])
+    return envs
+
+
+def readProps(inifile, env=None):
+    """Connection properties of env, cached until inifile changes."""
+    key = (os.path.abspath(inifile), env or 'default')
+    stamp = _stamp(key[0])
+    with _lock:
+        hit = _props.get(key)
+    if hit is not None and hit[0] == stamp:
+        return copy.deepcopy(hit[1])
+    props = _readProps(inifile, env)
+    # the file may have been rewritten with the encoded password
+    with _lock:
+        _props[key] = (_stamp(key[0]), props)
+    return copy.deepcopy(props)
+
+
+def hedgeOptions(config, section):
+    """Hedged read settings of a config section, None unless hedge is enabled."""
+    if not config.has_option(section, 'hedge'):
+        return None
+    if str(config.get(section, 'hedge')).strip().lower() not in ['true', 'yes', '1']:
+        return None
+    hedge = {'percentile': 95, 'minDelay': 0.05}
+    if config.has_option(section, 'hedge_percentile'):
+        hedge['percentile'] = config.getfloat(section, 'hedge_percentile')
+    if config.has_option(section, 'hedge_min_delay'):
+        hedge['minDelay'] = config.getfloat(section, 'hedge_min_delay')
+    return hedge
+
+
+def _readProps(inifile, env=None):
+    section = sectionName(env)
     pwd = ''
     user = ''
     hosts = []
     verify = True
+    cacheSize = 0
+    cacheDir = None
+    limits = {}
+    pages = {}
+    pageState = None
+    snapshotDir = None
+    snapshotMaxAge = 300
+    snapshotFullAge = 3600
 
-    config = configparser.ConfigParser(allow_no_value=True)
-    config.read(inifile)
+    config = _read(inifile)
 
-    if not config.has_section('WASERVER'):
-        raise Exception(inifile + " must have connection properties in WASERVER section")
+    if not config.has_section(section):
+        raise Exception(inifile + " must have connection properties in " + section + " section")
 
-    if config.has_option('WASERVER', 'pwd'):
-        pwd = config.get('WASERVER', 'pwd')
+    if config.has_option(section, 'pwd'):
+        # the only case where the ini file is written: replace the clear password
+        pwd = config.get(section, 'pwd')
         enc = base64.b64encode(pwd.encode('utf-8')).decode('utf-8')
-        config.remove_option('WASERVER', 'pwd')
-        config.set('WASERVER', '; pwd = yourpassword')
-        config.set('WASERVER', 'key', enc)
+        config = copy.deepcopy(config)
+        config.remove_option(section, 'pwd')
+        config.set(section, '; pwd = yourpassword')
+        config.set(section, 'key', enc)
         with open(inifile, 'w') as configfile:
             config.write(configfile)
-    elif config.has_option('WASERVER', 'key'):
-        enc = config.get('WASERVER', 'key')
+    elif config.has_option(section, 'key'):
+        enc = config.get(section, 'key')
         pwd = base64.b64decode(enc.encode('utf-8')).decode('utf-8')
 
-    if config.has_option('WASERVER', 'user'):
-        user = config.get('WASERVER', 'user')
+    if config.has_option(section, 'user'):
+        user = config.get(section, 'user')
 
-    if config.has_option('WASERVER', 'hosts'):
-        rawhosts = config.get('WASERVER', 'hosts')
+    if config.has_option(section, 'hosts'):
+        rawhosts = config.get(section, 'hosts')
         hosts = [h.strip() for h in rawhosts.split(",")]
 
-    if config.has_option('WASERVER', 'verify'):
-        rawVerify = config.get('WASERVER', 'verify')
+    if config.has_option(section, 'verify'):
+        rawVerify = config.get(section, 'verify')
         verify = str(rawVerify).strip().lower() not in ['false', 'no', '0']
 
-    props = {'user': user, 'pwd': pwd, 'hosts': hosts, 'verify': verify}
+    if config.has_option(section, 'cache_size'):
+        cacheSize = config.getint(section, 'cache_size')
+
+    if config.has_option(section, 'cache_dir'):
+        cacheDir = config.get(section, 'cache_dir')
+
+    for kind in ('read', 'action'):
+        for opt in ('_rate', '_burst'):
+            if config.has_option(section, kind + opt):
+                limits[kind + opt] = config.getfloat(section, kind + opt)
+        if config.has_option(section, kind + '_in_flight'):
+            limits[kind + '_in_flight'] = config.getint(section, kind + '_in_flight')
+    if limits and config.has_option(section, 'limit_dir'):
+        limits['dir'] = config.get(section, 'limit_dir')
+
+    hedge = hedgeOptions(config, section)
+
+    for opt, key in (('page_min', 'minSize'), ('page_max', 'maxSize'), ('page_initial', 'initial')):
+        if config.has_option(section, opt):
+            pages[key] = config.getint(section, opt)
+    if config.has_option(section, 'page_target'):
+        pages['target'] = config.getfloat(section, 'page_target')
+
+    if config.has_option(section, 'page_state'):
+        pageState = config.get(section, 'page_state')
+
+    if config.has_option(section, 'snapshot_dir'):
+        snapshotDir = config.get(section, 'snapshot_dir')
+    if config.has_option(section, 'snapshot_max_age'):
+        snapshotMaxAge = config.getfloat(section, 'snapshot_max_age')
+    if config.has_option(section, 'snapshot_full_age'):
+        snapshotFullAge = config.getfloat(section, 'snapshot_full_age')
+
+    props = {'env': env or 'default', 'user': user, 'pwd': pwd, 'hosts': hosts, 'verify': verify,
+             'cacheSize': cacheSize, 'cacheDir': cacheDir, 'limits': limits, 'hedge': hedge,
+             'pages': pages, 'pageState': pageState,
+             'snapshotDir': snapshotDir, 'snapshotMaxAge': snapshotMaxAge, 'snapshotFullAge': snapshotFullAge}
     return props
 
@@ -0,0 +1,98 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import threading
+import time
+import uuid
+
+
+def chunks(lines, header=None, maxChars=7000, maxLines=None):
+    """Group lines lazily into messages of at most maxChars / maxLines.
+
+    Lines are pulled from the iterable only when needed, so the first
+    message can be sent before the later lines are even formatted. header
+    starts the first message. Nothing is yielded when there are no lines.
+    """
+    buf = [header] if header else []
+    size = len(header) + 1 if header else 0
+    count = 0
+    for line in lines:
+        if count and (size + len(line) + 1 > maxChars or (maxLines and count >= maxLines)):
+            yield '\n'.join(buf)
+            buf, size, count = [], 0, 0
+        buf.append(line)
+        size += len(line) + 1
+        count += 1
+    if count:
+        yield '\n'.join(buf)
+
+
+def page(items, format, start=0, maxChars=7000, maxLines=None):
+    """Format items from start until a page is full.
+
+    format returns a line, or None to skip the item. Returns the lines and
+    the index of the first item of the next page, None on the last page.
+    """
+    lines = []
+    size = 0
+    i = start
+    while i < len(items):
+        line = format(items[i])
+        if line is not None:
+            if lines and (size + len(line) + 1 > maxChars or (maxLines and len(lines) >= maxLines)):
+                return lines, i
+            lines.append(line)
+            size += len(line) + 1
+        i += 1
+    return lines, None
+
+
+def nextPageCard(cursor, remaining, title='Next page'):
+    return {
+        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+        "type": "AdaptiveCard",
+        "version": "1.2",
+        "body": [{"type": "TextBlock", "text": "%d more results" % remaining, "wrap": True}],
+        "actions": [{"type": "Action.Submit", "title": title,
+                     "data": {"action": "next_page", "cursor": cursor}}]
+    }
+
+
+class CursorStore:
+    """Server-side cursors over the rest of a result, for "next page" actions.
+
+    The raw remaining items are kept, not the formatted text, and pages
+    are formatted only when asked for. With a SharedCache the cursors are
+    visible to every bot worker, otherwise they live in this process.
+    """
+
+    def __init__(self, ttl=900, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self.cursors = {}
+        self.lock = threading.Lock()
+
+    def put(self, items):
+        cursor = uuid.uuid4().hex
+        if self.shared is not None:
+            self.shared.set('cursor:' + cursor, items, self.ttl)
+            return cursor
+        with self.lock:
+            now = time.time()
+            for c in [c for c, (_, expires) in self.cursors.items() if expires < now]:
+                del self.cursors[c]
+            self.cursors[cursor] = (items, now + self.ttl)
+        return cursor
+
+    def get(self, cursor):
+        """The items of cursor, None if unknown or expired."""
+        if self.shared is not None:
+            found, items = self.shared.get('cursor:' + cursor)
+            return items if found else None
+        with self.lock:
+            items, expires = self.cursors.get(cursor, (None, 0))
+        if expires < time.time():
+            return None
+        return items
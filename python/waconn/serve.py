@@ -0,0 +1,35 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+
+
+def serve(app, host, port, workers=1, timeout=120):
+    """Run a Flask app, in several gunicorn worker processes when workers > 1.
+
+    gunicorn is only needed for the multi-process mode. A worker silent for
+    more than timeout seconds is killed and restarted, so it must be longer
+    than the slowest request (fan-out timeout, full plan load). The same
+    app can also be started directly, e.g. gunicorn -w 4 -t 120 webex_loaded_bot:app
+
+    gunicorn takes SIGUSR1 (reopen the log files) in every process, so the
+    SIGUSR1 debug switch of waconn.log.configure() does not work there:
+    set WACONN_DEBUG_FILE and create that file to log at DEBUG.
+    """
+    if workers <= 1:
+        app.run(host=host, port=port)
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', '%s:%d' % (host, port))
+            self.cfg.set('workers', workers)
+            self.cfg.set('timeout', timeout)
+
+        def load(self):
+            return app
+
+    Application().run()
@@ -0,0 +1,97 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedCache:
+    """TTL cache shared by every process using the same SQLite file.
+
+    The database runs in WAL mode so readers in other workers are never
+    blocked by a writer. getOrCompute() also makes sure that, for a key
+    missing everywhere, only one worker computes it while the others wait
+    for its result instead of sending the same query to the master.
+    Values must be JSON serializable. Expired entries are purged by set(),
+    at most every purgeInterval seconds in each process.
+    """
+
+    def __init__(self, path, ttl=30, wait=30, purgeInterval=60):
+        self.path = path
+        self.ttl = ttl
+        self.wait = wait
+        self.purgeInterval = purgeInterval
+        self.lastPurge = time.time()
+        self.local = threading.local()
+        self._db().executescript('''
+            CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL);
+            CREATE TABLE IF NOT EXISTS pending (key TEXT PRIMARY KEY, until REAL);
+        ''')
+
+    def _db(self):
+        # one connection per thread and per process (connections do not survive a fork)
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+            self.local.pid = os.getpid()
+        return db
+
+    def get(self, key):
+        """(True, value) if key is cached and fresh, (False, None) otherwise."""
+        row = self._db().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._db().execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                           (key, json.dumps(value), expires))
+        if time.time() - self.lastPurge > self.purgeInterval:
+            self.lastPurge = time.time()
+            self.purge()
+
+    def delete(self, key):
+        self._db().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def purge(self):
+        """Drop expired entries."""
+        now = time.time()
+        db = self._db()
+        db.execute('DELETE FROM cache WHERE expires < ?', (now,))
+        db.execute('DELETE FROM pending WHERE until < ?', (now,))
+
+    def _claim(self, key):
+        db = self._db()
+        now = time.time()
+        db.execute('DELETE FROM pending WHERE key = ? AND until < ?', (key, now))
+        cur = db.execute('INSERT OR IGNORE INTO pending (key, until) VALUES (?, ?)', (key, now + self.wait))
+        return cur.rowcount == 1
+
+    def getOrCompute(self, key, compute, ttl=None):
+        found, value = self.get(key)
+        if found:
+            return value
+        deadline = time.time() + self.wait
+        while not self._claim(key):
+            # another worker is computing it
+            time.sleep(0.05)
+            found, value = self.get(key)
+            if found:
+                return value
+            if time.time() > deadline:
+                break
+        try:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            self._db().execute('DELETE FROM pending WHERE key = ?', (key,))
@@ -0,0 +1,306 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import fnmatch
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from itertools import chain
+
+from .log import logger
+from .wait import jobGroup
+
+MAGIC = b'WASNAP01'
+# objects are compressed by blocks of BLOCK rows
+BLOCK = 256
+
+# uri, filters and columns of the plan queries a snapshot can hold
+KINDS = {
+    'job': ('/plan/current/job/query', {"filters": {"jobInPlanFilter": {"jobName": "*"}}},
+            ['id', 'name', 'status.internalStatus', 'jobStreamInPlan.name',
+             'jobStreamInPlan.workstationKey.name',
+             'jobDefinition.jobDefinitionInPlanKey.workstationInPlanKey.name']),
+    'jobstream': ('/plan/current/jobstream/query', {"filters": {"jobStreamInPlanFilter": {"jobStreamName": "*"}}},
+                  ['id', 'key.name', 'key.workstationKey.name', 'key.startTime', 'status.internalStatus']),
+}
+
+# the jobs of a job stream change while it runs, otherwise only with its status
+RUNNING_STATES = frozenset(['EXEC'])
+
+
+def pick(o, path):
+    for k in path.split('.'):
+        if not isinstance(o, dict) or k not in o:
+            return None
+        o = o[k]
+    return o
+
+
+def streamGroup(stream):
+    """(workstation, job stream name) of a job stream in plan, as jobGroup() for its jobs."""
+    key = stream.get('key') or {}
+    return ((key.get('workstationKey') or {}).get('name'), key.get('name'))
+
+
+def _flatten(objects):
+    for o in objects:
+        if isinstance(o, list):
+            yield from o
+        else:
+            yield o
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def write(path, kind, objects, meta=None):
+    """Write objects (or pages of objects) of kind to a snapshot file.
+
+    Each column is dictionary encoded: the distinct values once, then one
+    32-bit code per row, so it can be filtered straight from the mapped
+    file. The whole objects follow, as zlib compressed JSON blocks.
+    """
+    objects = list(_flatten(objects))
+    columns = KINDS[kind][2]
+    header = {'kind': kind, 'created': time.time(), 'rows': len(objects), 'byteorder': sys.byteorder,
+              'meta': meta or {}, 'columns': []}
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<QI', 0, 0))
+        for name in columns:
+            codes = array('I')
+            values = {}
+            for o in objects:
+                v = pick(o, name)
+                codes.append(values.setdefault('' if v is None else str(v), len(values)))
+            encoded = [v.encode('utf-8') for v in values]
+            offsets = array('I', [0])
+            for e in encoded:
+                offsets.append(offsets[-1] + len(e))
+            _pad(f)
+            col = {'name': name, 'values': len(encoded), 'offsets': f.tell()}
+            offsets.tofile(f)
+            col['blob'] = f.tell()
+            f.write(b''.join(encoded))
+            _pad(f)
+            col['codes'] = f.tell()
+            codes.tofile(f)
+            header['columns'].append(col)
+
+        _pad(f)
+        # block offsets from start, the first block follows the offsets
+        table = 8 * ((len(objects) + BLOCK - 1) // BLOCK + 1)
+        blocks = array('Q', [table])
+        start = f.tell()
+        f.seek(start + table)
+        for i in range(0, len(objects), BLOCK):
+            f.write(zlib.compress(json.dumps(objects[i:i + BLOCK], separators=(',', ':')).encode('utf-8')))
+            blocks.append(f.tell() - start)
+        end = f.tell()
+        f.seek(start)
+        blocks.tofile(f)
+        header['blocks'] = start
+
+        f.seek(end)
+        data = json.dumps(header).encode('utf-8')
+        f.write(data)
+        f.seek(len(MAGIC))
+        f.write(struct.pack('<QI', end, len(data)))
+
+
+class PlanSnapshot:
+    """Plan query results kept in a memory-mapped columnar file.
+
+    The file written by save() or refresh() is mapped read-only, so a new
+    process gets the whole plan without querying the master and without
+    reading more of the file than it uses. select() filters rows on the
+    encoded columns, objects() decompresses only the blocks holding the
+    rows asked for. Once older than maxAge seconds, refresh() updates it:
+    for jobs only the job streams that are new, changed state or are
+    running are queried again. The jobs of the other job streams are kept,
+    so a job added to one of them (e.g. by submit_job.py) appears at the
+    next full query: one every fullAge seconds, or when more than
+    maxGroups job streams (default 10% of the plan, at least 50) changed.
+    """
+
+    def __init__(self, path, kind='job', maxAge=300, maxGroups=None, fullAge=3600):
+        self.path = path
+        self.kind = kind
+        self.maxAge = maxAge
+        self.maxGroups = maxGroups
+        self.fullAge = fullAge
+        self.header = None
+        self.view = None
+        self.values = {}
+        self.block = (None, None)
+        self.load()
+
+    def load(self):
+        """Map the file again, False if it is missing or not a snapshot of kind."""
+        try:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        view = memoryview(mm)
+        try:
+            if view[:len(MAGIC)] != MAGIC:
+                return False
+            offset, length = struct.unpack_from('<QI', view, len(MAGIC))
+            header = json.loads(bytes(view[offset:offset + length]))
+        except (struct.error, ValueError):
+            return False
+        if header.get('kind') != self.kind or header.get('byteorder') != sys.byteorder:
+            return False
+        # the previous mapping is released with its last view
+        self.header = header
+        self.view = view
+        self.values = {}
+        self.block = (None, None)
+        return True
+
+    @property
+    def created(self):
+        return self.header['created'] if self.header else None
+
+    @property
+    def age(self):
+        return time.time() - self.header['created'] if self.header else float('inf')
+
+    @property
+    def fresh(self):
+        return self.age <= self.maxAge
+
+    @property
+    def meta(self):
+        return self.header['meta'] if self.header else {}
+
+    def __len__(self):
+        return self.header['rows'] if self.header else 0
+
+    def _column(self, name):
+        for c in self.header['columns']:
+            if c['name'] == name:
+                return c
+        raise KeyError(name)
+
+    def _codes(self, name):
+        c = self._column(name)
+        return self.view[c['codes']:c['codes'] + 4 * len(self)].cast('I')
+
+    def distinct(self, name):
+        """Distinct values of a column, indexed by their code."""
+        if name not in self.values:
+            c = self._column(name)
+            offsets = self.view[c['offsets']:c['offsets'] + 4 * (c['values'] + 1)].cast('I')
+            blob = self.view[c['blob']:c['blob'] + offsets[-1]]
+            self.values[name] = [str(blob[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(c['values'])]
+        return self.values[name]
+
+    def column(self, name):
+        values = self.distinct(name)
+        return [values[c] for c in self._codes(name)]
+
+    def select(self, where=None):
+        """Rows whose columns match every {column: wildcard pattern} of where."""
+        rows = None
+        for name, pattern in (where or {}).items():
+            codes = set(i for i, v in enumerate(self.distinct(name)) if fnmatch.fnmatchcase(v, pattern))
+            match = [r for r, c in enumerate(self._codes(name)) if c in codes and (rows is None or r in rows)]
+            rows = set(match)
+        return sorted(rows) if rows is not None else range(len(self))
+
+    def _blockObjects(self, b):
+        if self.block[0] != b:
+            blocks = self.view[self.header['blocks']:self.header['blocks'] + 8 * (b + 2)].cast('Q')
+            start = self.header['blocks'] + blocks[b]
+            self.block = (b, json.loads(zlib.decompress(self.view[start:self.header['blocks'] + blocks[b + 1]])))
+        return self.block[1]
+
+    def objects(self, rows=None):
+        """Yield the objects of rows (every row by default), in row order."""
+        if not self.header:
+            return
+        for r in (rows if rows is not None else range(len(self))):
+            yield self._blockObjects(r // BLOCK)[r % BLOCK]
+
+    def query(self, where=None):
+        return list(self.objects(self.select(where)))
+
+    def save(self, objects, meta=None):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        write(tmp, self.kind, objects, meta)
+        os.replace(tmp, self.path)
+        self.load()
+        return self
+
+    def refresh(self, query, force=False):
+        """Bring the snapshot up to date if older than maxAge.
+
+        query(uri, filters) returns the result as pages, e.g. WAConn.query.
+        Processes sharing the file refresh it one at a time, under a lock
+        on path + '.lock': the ones that waited find it fresh and do not
+        query the master again. Returns 'fresh', 'incremental' or 'full'.
+        """
+        import fcntl
+        # another process sharing the file may have refreshed it already
+        self.load()
+        if self.fresh and not force:
+            return 'fresh'
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not force and self.load() and self.fresh:
+                return 'fresh'
+            return self._refresh(query)
+
+    def _refresh(self, query):
+        uri, filters, _ = KINDS[self.kind]
+        if self.kind != 'job':
+            self.save(query(uri, filters))
+            logger.info('Plan snapshot %s: %d objects', self.path, len(self))
+            return 'full'
+
+        jsUri, jsFilters, _ = KINDS['jobstream']
+        streams = {s['id']: [streamGroup(s), pick(s, 'status.internalStatus')]
+                   for s in _flatten(query(jsUri, jsFilters))}
+        old = self.meta.get('streams')
+        full = self.meta.get('full', self.created)
+        maxGroups = self.maxGroups or max(50, len(streams) // 10)
+
+        changed = set()
+        if old is not None:
+            # job streams that are new, changed state or still run; the jobs of the others are kept
+            for sid, (group, status) in streams.items():
+                if sid not in old or old[sid][1] != status or status in RUNNING_STATES:
+                    changed.add(tuple(group))
+        if (not self.header or old is None or len(changed) > maxGroups
+                or self.fullAge and time.time() - full > self.fullAge):
+            self.save(query(uri, filters), {'streams': streams, 'full': time.time()})
+            logger.info('Plan snapshot %s: %d jobs, %d job streams changed', self.path, len(self), len(changed))
+            return 'full'
+
+        groups = set(tuple(g) for g, _ in streams.values())
+        kept = (j for j in self.objects() if jobGroup(j) in groups and jobGroup(j) not in changed)
+        queried = (query(uri, {"filters": {"jobInPlanFilter": {"workstationName": wks, "jobStreamName": name}}})
+                   for wks, name in changed)
+        self.save(chain(kept, chain.from_iterable(queried)), {'streams': streams, 'full': full})
+        logger.info('Plan snapshot %s: %d jobs, %d job streams queried again', self.path, len(self), len(changed))
+        return 'incremental'
+
+
+def snapshotFor(conn, kind='job'):
+    """PlanSnapshot of conn's environment if snapshot_dir is configured, else None."""
+    config = conn.config
+    if not config.get('snapshotDir'):
+        return None
+    path = os.path.join(config['snapshotDir'], '%s.%s.wasnap' % (config['env'], kind))
+    return PlanSnapshot(path, kind, config.get('snapshotMaxAge', 300), fullAge=config.get('snapshotFullAge', 3600))
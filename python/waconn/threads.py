@@ -0,0 +1,28 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import threading
+from concurrent.futures import Future
+
+
+def spawn(fn, *args, name=None):
+    """Run fn(*args) in a new daemon thread, return a Future of its result.
+
+    Unlike ThreadPoolExecutor workers, which are joined at interpreter exit,
+    a call that is abandoned (timed out, or beaten by a hedged request)
+    does not keep the process alive.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
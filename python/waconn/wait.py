@@ -0,0 +1,145 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import time
+from concurrent.futures import Future
+
+from .log import logger
+
+FINAL_STATES = frozenset(['SUCC', 'ABEND', 'FAIL', 'CANCL'])
+
+
+class _Waiting:
+    def __init__(self, jobId, group, targets, expected, start):
+        self.jobId = jobId
+        self.group = group
+        self.targets = targets
+        self.due = start + expected if expected else None
+        self.future = Future()
+
+
+def jobGroup(job):
+    """(workstation, job stream name) of a job in plan, None if unknown."""
+    js = job.get('jobStreamInPlan') or {}
+    wks = (js.get('workstationKey') or {}).get('name')
+    if wks and js.get('name'):
+        return (wks, js['name'])
+    return None
+
+
+class JobWaiter:
+    """Wait for many jobs in plan to reach a target state.
+
+    Jobs are grouped by job stream instance so every poll cycle sends one
+    /plan/current/job/query per job stream, whatever the number of jobs
+    in it. Jobs added by id only are read one by one. Each job gets a
+    Future that resolves with the job in plan once its internalStatus is
+    one of the targets. The interval starts at minInterval and grows up to
+    maxInterval, but the next poll is never later than the earliest
+    expected completion of a pending job.
+    """
+
+    def __init__(self, conn, minInterval=5, maxInterval=60, backoff=1.5, howMany='500'):
+        self.conn = conn
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.howMany = howMany
+        self.interval = minInterval
+        self.pending = {}
+
+    def add(self, job, targets=FINAL_STATES, expected=None):
+        """Start waiting for job, a job in plan dict or just its id.
+
+        expected is the expected duration in seconds, used to schedule polls.
+        """
+        if isinstance(job, dict):
+            jobId = job['id']
+            group = jobGroup(job)
+        else:
+            jobId = job
+            group = None
+        w = _Waiting(jobId, group, frozenset(targets), expected, time.time())
+        self.pending[jobId] = w
+        return w.future
+
+    def _query(self, group, ids):
+        wks, jsName = group
+        filters = {"filters": {"jobInPlanFilter": {"workstationName": wks, "jobStreamName": jsName}}}
+        return [j for page in self.conn.query('/plan/current/job/query', filters, howMany=self.howMany)
+                for j in page if j.get('id') in ids]
+
+    def poll(self):
+        """Run one poll cycle, return the number of jobs resolved."""
+        groups = {}
+        single = []
+        for w in self.pending.values():
+            if w.group is None:
+                single.append(w.jobId)
+            else:
+                groups.setdefault(w.group, set()).add(w.jobId)
+
+        # a failed query only skips its jobs in this cycle, they are polled again next time
+        found = []
+        for group, ids in groups.items():
+            try:
+                found.extend(self._query(group, ids))
+            except Exception as e:
+                logger.warning('Polling jobs of %s#%s failed: %s', group[0], group[1], e)
+        for jobId in single:
+            try:
+                resp = self.conn.get('/plan/current/job/' + jobId)
+            except Exception as e:
+                logger.warning('Polling job %s failed: %s', jobId, e)
+                continue
+            if resp.ok:
+                found.append(resp.json())
+            else:
+                logger.warning('Polling job %s failed: HTTP %d', jobId, resp.status_code)
+
+        resolved = 0
+        for job in found:
+            w = self.pending.get(job.get('id'))
+            if w is None:
+                continue
+            if (job.get('status') or {}).get('internalStatus') in w.targets:
+                del self.pending[w.jobId]
+                w.future.set_result(job)
+                resolved += 1
+
+        if resolved:
+            self.interval = self.minInterval
+        else:
+            self.interval = min(self.interval * self.backoff, self.maxInterval)
+        return resolved
+
+    def nextDelay(self):
+        now = time.time()
+        due = [w.due - now for w in self.pending.values() if w.due is not None and w.due > now]
+        delay = self.interval
+        if due:
+            delay = min(delay, max(min(due), self.minInterval))
+        return delay
+
+    def run(self, timeout=None):
+        """Poll until every job resolved or timeout seconds passed.
+
+        Jobs still pending at the timeout get a TimeoutError.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.pending:
+            self.poll()
+            if not self.pending:
+                break
+            delay = self.nextDelay()
+            if deadline is not None:
+                left = deadline - time.time()
+                if left <= 0:
+                    for w in self.pending.values():
+                        w.future.set_exception(TimeoutError('job %s still not in %s' % (w.jobId, sorted(w.targets))))
+                    self.pending.clear()
+                    break
+                delay = min(delay, left)
+            time.sleep(delay)
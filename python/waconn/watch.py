@@ -0,0 +1,124 @@
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import time
+
+
+def jobKey(job):
+    return job['id']
+
+
+def jobStatus(job):
+    status = job.get('status') or {}
+    return status.get('internalStatus')
+
+
+class PlanWatcher:
+    """Poll a plan query and notify subscribers only about what changed.
+
+    The last snapshot is kept in memory, keyed by object id. Every poll
+    compares the new result with it and emits 'added', 'removed' and
+    'changed' events. Every page of the result is read. The interval
+    shrinks back to minInterval when something changes and grows up to
+    maxInterval while the plan is quiet. When the whole result fits in one
+    page and the server returns an ETag, the next poll sends it back in
+    If-None-Match, so an unchanged plan costs a 304 with no body.
+    """
+
+    def __init__(self, conn, uri, filters, howMany='500',
+                 minInterval=5, maxInterval=120, backoff=1.5,
+                 key=jobKey, status=jobStatus):
+        self.conn = conn
+        self.uri = uri
+        self.filters = filters
+        self.howMany = howMany
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.key = key
+        self.status = status
+        self.interval = minInterval
+        self.snapshot = None
+        self.etag = None
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def fetch(self):
+        """Current result by key, every page of it; None if unchanged or failed."""
+        headers = {'How-Many': self.howMany}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        current = {}
+        pages = 0
+        host = None
+        while True:
+            # the next pages go to the host that answered the first one
+            resp = self.conn.request('POST', self.uri, headers=headers, json=self.filters, host=host)
+            if resp.status_code == 304:
+                return None
+            if not resp.ok:
+                return None
+            if not pages:
+                etag = resp.headers.get('ETag')
+            page = resp.json()
+            pages += 1
+            current.update((self.key(o), o) for o in page)
+            nextPage = resp.headers.get('Next-Page')
+            if not nextPage or not page:
+                break
+            headers = {'How-Many': self.howMany, 'Next-Page': nextPage}
+            host = resp.waHost
+        # the ETag only covers the first page, it cannot tell a longer result is unchanged
+        self.etag = etag if pages == 1 else None
+        return current
+
+    def diff(self, old, new):
+        events = []
+        for k, o in new.items():
+            if k not in old:
+                events.append({'type': 'added', 'id': k, 'old': None, 'new': o})
+            elif self.status(old[k]) != self.status(o):
+                events.append({'type': 'changed', 'id': k, 'old': old[k], 'new': o})
+        for k, o in old.items():
+            if k not in new:
+                events.append({'type': 'removed', 'id': k, 'old': o, 'new': None})
+        return events
+
+    def poll(self):
+        current = self.fetch()
+        if current is None:
+            events = []
+        elif self.snapshot is None:
+            # first poll only primes the snapshot
+            self.snapshot = current
+            events = []
+        else:
+            events = self.diff(self.snapshot, current)
+            self.snapshot = current
+
+        if events:
+            self.interval = self.minInterval
+        else:
+            self.interval = min(self.interval * self.backoff, self.maxInterval)
+
+        for e in events:
+            for s in list(self.subscribers):
+                s(e)
+        return events
+
+    def run(self, stop=None):
+        """Poll until stop (a threading.Event) is set, or forever."""
+        while stop is None or not stop.is_set():
+            self.poll()
+            if stop is not None:
+                stop.wait(self.interval)
+            else:
+                time.sleep(self.interval)
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+#############################################################################
+# Licensed Materials - Property of HCL*
+# (C) Copyright HCL Technologies Ltd. 2017, 2020 All rights reserved.
+# * Trademark of HCL Technologies Limited
+#############################################################################
+import waconn
+import argparse
+
+parser = argparse.ArgumentParser(description='Watch jobs in plan and print status changes.')
+parser.add_argument('-j','--jname', help='job name filter', required=True, metavar="J_FILTER")
+parser.add_argument('--min-interval', help='shortest polling interval in seconds', type=float, default=5, metavar="SECONDS")
+parser.add_argument('--max-interval', help='longest polling interval in seconds', type=float, default=120, metavar="SECONDS")
+parser.add_argument('--abend-only', help='only report jobs that changed to ABEND', action='store_true')
+
+args = parser.parse_args()
+conn = waconn.WAConn('waconn.ini','/twsd')
+
+watcher = waconn.PlanWatcher(conn, '/plan/current/job/query',
+	{ "filters": { "jobInPlanFilter": { "jobName": args.jname } } },
+	minInterval=args.min_interval, maxInterval=args.max_interval)
+
+def jobName(j):
+    return j["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]+'#'+j["jobStreamInPlan"]["name"]+'.'+j["name"]
+
+def report(e):
+    if e['type'] == 'added':
+        status = waconn.watch.jobStatus(e['new'])
+        if not args.abend_only:
+            print('New job %s (%s)' % (jobName(e['new']), status))
+    elif e['type'] == 'removed':
+        if not args.abend_only:
+            print('Removed job %s' % (jobName(e['old'])))
+    else:
+        old = waconn.watch.jobStatus(e['old'])
+        new = waconn.watch.jobStatus(e['new'])
+        if not args.abend_only or new == 'ABEND':
+            print('Job %s: %s -> %s' % (jobName(e['new']), old, new))
+
+watcher.subscribe(report)
+
+try:
+    watcher.run()
+except KeyboardInterrupt:
+    pass
@@ -1,28 +1,32 @@
 import requests
-import configparser
 import json
 import logging
+from waconn.log import Payload, configure as configure_logging
+from waconn.serve import serve
+from waconn import reply
+from bot_common import config, shared_cache, query_job_all, format_impact, query_jobstreams, rc_evaluation, format_job_line
 from flask import Flask, request
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
 app = Flask(__name__)
 
-# Load config
-config = configparser.ConfigParser()
-config.read('config.ini')
-
 WEBEX_TOKEN = config['WEBEX']['access_token']
+WEBEX_API = config['WEBEX'].get('api_base', 'https://webexapis.com/v1').rstrip('/')
+BOT_PORT = config['WEBEX'].getint('port', fallback=80)
+# long answers: several messages ('messages') or one page plus a "next page" card ('cards')
+REPLY_MODE = config['WEBEX'].get('reply_mode', 'messages')
+REPLY_MAX_CHARS = config['WEBEX'].getint('reply_max_chars', fallback=7000)
+REPLY_PAGE_LINES = config['WEBEX'].getint('reply_page_lines', fallback=0) or None
 ALLOWED_ROOM_ID = config['WEBEX'].get('allowed_room_id', '').strip()
-API_BASE = config['TWS_API']['base_url']
-API_USER = config['TWS_API']['user']
-API_PASS = config['TWS_API']['password']
-VERIFY_SSL = config['TWS_API'].getboolean('verify_ssl', fallback=True)
-TIMEZONE_OFFSET = config['TWS_API'].getint('timezone_offset', fallback=0)
+WORKERS = config['WEBEX'].getint('workers', fallback=1)
+WORKER_TIMEOUT = config['WEBEX'].getint('worker_timeout', fallback=120)
+
+configure_logging(logging.INFO)
 
-logging.basicConfig(level=logging.INFO)
+cursors = reply.CursorStore(shared=shared_cache)
 
 def send_webex_card(room_id, card_json):
-    url = "https://webexapis.com/v1/messages"
+    url = f"{WEBEX_API}/messages"
     headers = {
         "Authorization": f"Bearer {WEBEX_TOKEN}",
         "Content-Type": "application/json"
@@ -33,18 +37,20 @@ def send_webex_card(room_id, card_json):
         "attachments": [{"contentType": "application/vnd.microsoft.card.adaptive", "content": card_json}]
     }
     resp = requests.post(url, headers=headers, json=data)
-    logging.info(f"Webex send card response: {resp.status_code} {resp.text}")
+    logging.info("Webex send card response: %s", resp.status_code)
+    logging.debug("Webex send card response body: %s", Payload(resp.text))
     return resp
 
 def send_webex_message(room_id, text):
-    url = "https://webexapis.com/v1/messages"
+    url = f"{WEBEX_API}/messages"
     headers = {
         "Authorization": f"Bearer {WEBEX_TOKEN}",
         "Content-Type": "application/json"
     }
     data = {"roomId": room_id, "text": text}
     resp = requests.post(url, headers=headers, json=data)
-    logging.info(f"Webex send message response: {resp.status_code} {resp.text}")
+    logging.info("Webex send message response: %s", resp.status_code)
+    logging.debug("Webex send message response body: %s", Payload(resp.text))
     return resp
 
 def create_menu_card():
@@ -105,63 +111,10 @@ def create_menu_card():
         ]
     }
 
-def query_job(job_name):
-    url = f"{API_BASE}/plan/current/job/query"
-    payload = {
-        "filters": {
-            "jobInPlanFilter": {
-                "jobName": job_name
-            }
-        }
-    }
-    headers = {'How-Many': '500', 'Accept': 'application/json'}
-    resp = requests.post(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        json=payload,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def query_jobstreams(js_name):
-    url = f"{API_BASE}/model/jobstream"
-    params = {'key': js_name}
-    headers = {'Accept': 'application/json'}
-    resp = requests.get(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        params=params,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def rc_evaluation(jobstream_id, from_date, to_date):
-    url = f"{API_BASE}/model/jobstream/{jobstream_id}/rc-evaluation"
-    params = {'from': from_date, 'to': to_date}
-    headers = {'Accept': 'application/json'}
-    resp = requests.get(
-        url,
-        auth=(API_USER, API_PASS),
-        headers=headers,
-        params=params,
-        verify=VERIFY_SSL
-    )
-    resp.raise_for_status()
-    return resp.json()
-
-def format_start_time(utc_str, offset_hours):
-    dt = datetime.strptime(utc_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-    dt_local = dt + timedelta(hours=offset_hours)
-    return dt_local.strftime("%H:%M on %Y-%m-%d")
-
 @app.route('/lab/pcs/maestro/events/webex', methods=['POST'])
 def webex_webhook():
     data = request.json
-    logging.info(f"Received webhook data: {data}")
+    logging.debug("Received webhook data: %s", Payload(data))
     
     # Check if this is a card submission (attachmentAction)
     if 'resource' in data and data['resource'] == 'attachmentActions':
@@ -174,7 +127,7 @@ def webex_webhook():
 
     # Get message details
     msg_id = data['data']['id']
-    msg_url = f"https://webexapis.com/v1/messages/{msg_id}"
+    msg_url = f"{WEBEX_API}/messages/{msg_id}"
     headers = {"Authorization": f"Bearer {WEBEX_TOKEN}"}
     msg_resp = requests.get(msg_url, headers=headers)
     msg = msg_resp.json()
@@ -184,22 +137,31 @@ def webex_webhook():
 
     # Only respond in the allowed room
     if ALLOWED_ROOM_ID and room_id != ALLOWED_ROOM_ID:
-        logging.info(f"Ignoring message from room {room_id} (not allowed).")
+        logging.info("Ignoring message from room %s (not allowed).", room_id)
         return '', 200
 
     # Remove "Maestro" mention from the beginning if present
     if text.lower().startswith("maestro"):
         text = text[len("maestro"):].lstrip(" :").lstrip()
 
-    logging.info(f"Message received: text='{text}', room_id='{room_id}', person_id='{person_id}'")
+    logging.info("Message received: text='%s', room_id='%s', person_id='%s'", Payload(text, 200), room_id, person_id)
 
     # Ignore messages sent by the bot itself
-    me_resp = requests.get("https://webexapis.com/v1/people/me", headers=headers)
+    me_resp = requests.get(f"{WEBEX_API}/people/me", headers=headers)
     bot_id = me_resp.json().get("id")
     if person_id == bot_id:
         logging.info("Ignoring message from self.")
         return '', 200
 
+    if text.startswith('!impact '):
+        job_name = text[len('!impact '):].strip()
+        try:
+            send_webex_message(room_id, format_impact(job_name))
+        except Exception as e:
+            send_webex_message(room_id, f"Error computing impact: {e}")
+            logging.error("Error computing impact: %s", e)
+        return '', 200
+
     # If message starts with !, show the menu card
     if text.startswith('!'):
         card = create_menu_card()
@@ -211,7 +173,7 @@ def webex_webhook():
 def handle_attachment_action(data):
     # Get attachment action details
     action_id = data['data']['id']
-    action_url = f"https://webexapis.com/v1/attachment/actions/{action_id}"
+    action_url = f"{WEBEX_API}/attachment/actions/{action_id}"
     headers = {"Authorization": f"Bearer {WEBEX_TOKEN}"}
     action_resp = requests.get(action_url, headers=headers)
     action_data = action_resp.json()
@@ -221,14 +183,18 @@ def handle_attachment_action(data):
     
     # Only respond in the allowed room
     if ALLOWED_ROOM_ID and room_id != ALLOWED_ROOM_ID:
-        logging.info(f"Ignoring card submission from room {room_id} (not allowed).")
+        logging.info("Ignoring card submission from room %s (not allowed).", room_id)
         return '', 200
     
     action = inputs.get('action', '')
+    if action == 'next_page':
+        handle_next_page(room_id, inputs.get('cursor', ''))
+        return '', 200
+
     jobname = inputs.get('jobname', '').strip()
     enddate = inputs.get('enddate', '').strip()
     
-    logging.info(f"Card submission: action={action}, jobname={jobname}, enddate={enddate}")
+    logging.info("Card submission: action=%s, jobname=%s, enddate=%s", action, jobname, enddate)
     
     if not jobname:
         send_webex_message(room_id, "Please provide a job name.")
@@ -245,41 +211,51 @@ def handle_attachment_action(data):
     
     return '', 200
 
+def send_job_page(room_id, jobs, header):
+    """Send one page of jobs, and a "next page" card if more are left."""
+    lines, next_index = reply.page(jobs, format_job_line, 0, REPLY_MAX_CHARS, REPLY_PAGE_LINES)
+    if not lines:
+        return False
+    send_webex_message(room_id, header + "\n" + "\n".join(lines))
+    if next_index is not None:
+        rest = jobs[next_index:]
+        send_webex_card(room_id, reply.nextPageCard(cursors.put(rest), len(rest)))
+    return True
+
 def handle_loaded_query(room_id, job_name):
     try:
-        jobs = query_job(job_name)
-        logging.info(f"Job query for '{job_name}' returned: {jobs}")
-        if not jobs:
-            send_webex_message(room_id, f"No jobs found for '{job_name}'.")
+        jobs, missing = query_job_all(job_name)
+        logging.info("Job query for '%s' returned %d jobs", job_name, len(jobs))
+        logging.debug("Job query for '%s' returned: %s", job_name, Payload(jobs))
+        if REPLY_MODE == 'cards':
+            sent = send_job_page(room_id, jobs, "Jobs loaded:")
         else:
-            lines = []
-            for js in jobs:
-                try:
-                    line = (
-                        js["jobDefinition"]["jobDefinitionInPlanKey"]["workstationInPlanKey"]["name"]
-                        + '#' + '\u200b' + js["jobStreamInPlan"]["name"]
-                        + '.' + js["name"]
-                        + '   State: ' + js["status"]["internalStatus"]
-                        + '   Start Time: ' + format_start_time(js["jobStreamInPlan"]["startTime"], TIMEZONE_OFFSET)
-                    )
-                    lines.append(line)
-                except Exception as ex:
-                    logging.warning(f"Error parsing job entry: {ex}")
-                    continue
-            if lines:
-                result = "Jobs loaded:\n" + "\n".join(lines)
-                send_webex_message(room_id, result)
-            else:
-                send_webex_message(room_id, f"No jobs found for '{job_name}'.")
+            # each message goes out as soon as its rows are formatted
+            sent = False
+            for chunk in reply.chunks((l for l in map(format_job_line, jobs) if l is not None),
+                                      "Jobs loaded:", REPLY_MAX_CHARS, REPLY_PAGE_LINES):
+                send_webex_message(room_id, chunk)
+                sent = True
+        if not sent:
+            send_webex_message(room_id, f"No jobs found for '{job_name}'.")
+        if missing:
+            send_webex_message(room_id, "(no answer from: " + ", ".join(missing) + ")")
     except Exception as e:
         send_webex_message(room_id, f"Error querying job: {e}")
-        logging.error(f"Error querying job: {e}")
+        logging.error("Error querying job: %s", e)
+
+def handle_next_page(room_id, cursor):
+    jobs = cursors.get(cursor)
+    if jobs is None:
+        send_webex_message(room_id, "These results have expired, please run the query again.")
+    elif not send_job_page(room_id, jobs, "Jobs loaded (continued):"):
+        send_webex_message(room_id, "No more jobs.")
 
 def handle_willrun_query(room_id, js_name, to_date):
     today_str = datetime.utcnow().strftime('%Y-%m-%d')
     try:
         jobstreams = query_jobstreams(js_name)
-        logging.info(f"Jobstream query for '{js_name}' returned: {jobstreams}")
+        logging.debug("Jobstream query for '%s' returned: %s", js_name, Payload(jobstreams))
         if not jobstreams:
             send_webex_message(room_id, f"No job streams found for '{js_name}'.")
         else:
@@ -300,9 +276,9 @@ def handle_willrun_query(room_id, js_name, to_date):
                     else:
                         line = f"Job Stream ID: {js_id}\nNo SELECTED dates found."
                     lines.append(line)
-                    logging.info(f"Job Stream ID: {js_id} SELECTED dates: {selected_dates}")
+                    logging.debug("Job Stream ID: %s SELECTED dates: %s", js_id, Payload(selected_dates))
                 except Exception as ex:
-                    logging.warning(f"Error processing job stream entry: {ex}")
+                    logging.warning("Error processing job stream entry: %s", ex)
                     continue
             if lines:
                 result = "Job Streams RC Evaluation:\n\n" + "\n\n".join(lines)
@@ -311,7 +287,7 @@ def handle_willrun_query(room_id, js_name, to_date):
                 send_webex_message(room_id, f"No job streams found for '{js_name}' after parsing.")
     except Exception as e:
         send_webex_message(room_id, f"Error querying job stream: {e}")
-        logging.error(f"Error querying job stream: {e}")
+        logging.error("Error querying job stream: %s", e)
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=80)
\ No newline at end of file
+    serve(app, "0.0.0.0", BOT_PORT, WORKERS, WORKER_TIMEOUT)
\ No newline at end of file